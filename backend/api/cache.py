@@ -0,0 +1,100 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.ingredient_index import ingredient_index
+
+
+PREFIX = 'recipes:response'
+LIST_VERSION_KEY = f'{PREFIX}:list_version'
+STATS_KEYS = {'hits': f'{PREFIX}:hits', 'misses': f'{PREFIX}:misses'}
+
+
+def detail_version_key(pk):
+    return f'{PREFIX}:{pk}:version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_recipes(recipe_ids):
+    """Сбрасывает кэш списков рецептов и страниц переданных рецептов."""
+    version = uuid4().hex
+    cache.set_many(
+        {
+            LIST_VERSION_KEY: version,
+            **{detail_version_key(pk): version for pk in recipe_ids},
+        },
+        timeout=None
+    )
+
+
+def count_event(event):
+    try:
+        cache.incr(STATS_KEYS[event])
+    except ValueError:
+        cache.set(STATS_KEYS[event], 1, timeout=None)
+
+
+def response_cache_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    return {
+        event: values.get(key, 0) for event, key in STATS_KEYS.items()
+    }
+
+
+class AnonymousResponseCacheMixin:
+    """Кэширует list и retrieve для анонимных пользователей.
+
+    Ключ строится из полного URL запроса и версии: общей для списков
+    и отдельной для каждого рецепта. Сигналы из api.signals меняют
+    версии при изменении рецептов, их продуктов и авторов. В ключ
+    входит и версия каталога продуктов: рецепты показывают названия
+    и единицы измерения продуктов.
+    """
+
+    def cache_key(self, request, pk=None):
+        version = get_version(LIST_VERSION_KEY)
+        if pk is not None:
+            version = get_version(detail_version_key(pk))
+        catalogue = ingredient_index.catalogue_version()
+        url = md5(request.build_absolute_uri().encode()).hexdigest()
+        return f'{PREFIX}:{pk or "list"}:{version}:{catalogue}:{url}'
+
+    def cached_response(self, view_method, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view_method(request, *args, **kwargs)
+
+        key = self.cache_key(request, kwargs.get(self.lookup_field))
+        data = cache.get(key)
+        if data is not None:
+            count_event('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        count_event('misses')
+        response = view_method(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key, response.data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,47 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на If-None-Match / If-Modified-Since до сериализации.
+
+    Вьюсет описывает валидаторы в get_validators(), возвращая исходную
+    строку для ETag и, если представление не зависит от пользователя,
+    время последнего изменения.
+    """
+    conditional_actions = ('retrieve',)
+
+    def get_validators(self, request, **kwargs):
+        return None, None
+
+    def conditional_response(self, view_method, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return view_method(request, *args, **kwargs)
+        source, last_modified = self.get_validators(request, **kwargs)
+        if source is None:
+            return view_method(request, *args, **kwargs)
+
+        etag = quote_etag(md5(
+            f'{source}:{request.accepted_renderer.format}'.encode()
+        ).hexdigest())
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        ) or view_method(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,7 +1,12 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from django_filters import rest_framework as filters
 from recipes.models import Recipe
 
 
+SEARCH_CONFIG = 'russian'
+
+
 class RecipeFilter(filters.FilterSet):
     author = filters.NumberFilter(
         field_name='author__id'
@@ -12,10 +17,13 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
-        fields = ["author", "is_favorited", "is_in_shopping_cart"]
+        fields = ["author", "is_favorited", "is_in_shopping_cart", "search"]
 
     def filter_is_favorited(self, recipes, name, value):
         if value and self.request.user.is_authenticated:
@@ -30,3 +38,11 @@ class RecipeFilter(filters.FilterSet):
                 shoppingcarts__user=self.request.user
             )
         return recipes
+
+    def filter_search(self, recipes, name, value):
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return recipes.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', 'name', 'id')
@@ -1,6 +1,105 @@
-from rest_framework.pagination import PageNumberPagination
+from functools import partial
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
-    page_size = 6
\ No newline at end of file
+    page_size = 6
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с кэшируемым и, для больших таблиц, оценочным count.
+
+    Для запросов без фильтров count берётся из статистики Postgres
+    (pg_class.reltuples), если она превышает порог
+    PAGINATION_ESTIMATE_COUNT_THRESHOLD. Остальные значения кэшируются
+    по тексту запроса на PAGINATION_COUNT_CACHE_TIMEOUT секунд.
+    """
+
+    def __init__(self, *args, exact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+
+    def estimated_count(self):
+        query = self.object_list.query
+        if query.where or connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [query.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= settings.PAGINATION_ESTIMATE_COUNT_THRESHOLD:
+            return int(row[0])
+        return None
+
+    @cached_property
+    def count(self):
+        if self.exact:
+            return super().count
+        try:
+            sql = str(self.object_list.order_by().values('pk').query)
+        except EmptyResultSet:
+            return 0
+        key = f'pagination:count:{md5(sql.encode()).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = self.estimated_count()
+            if count is None:
+                count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CachedCountPagination(LimitPageNumberPagination):
+    """Постраничная пагинация с кэшированным количеством объектов.
+
+    Для параметров из exact_count_params (личные списки пользователя)
+    количество всегда считается точно.
+    """
+    exact_count_params = ('is_favorited', 'is_in_shopping_cart')
+    exact_count = False
+
+    @property
+    def django_paginator_class(self):
+        return partial(CachedCountPaginator, exact=self.exact_count)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.exact_count = any(
+            param in request.query_params
+            for param in self.exact_count_params
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class LimitCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = '-id'
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по параметру ?pagination=cursor.
+
+    По умолчанию остаётся постраничная пагинация pagination_class.
+    """
+    cursor_pagination_class = LimitCursorPagination
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.pagination_class is not None
+            and self.request.query_params.get('pagination') == 'cursor'
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
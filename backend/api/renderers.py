@@ -0,0 +1,121 @@
+import csv
+import json
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Файл отдаётся потоком через stream(), а render() нужен DRF только
+    для ответов об ошибках, которые приходят сюда словарём.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def stream(self, user, ingredients, recipes):
+        raise NotImplementedError
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def lines(self, user, ingredients, recipes):
+        now = datetime.now()
+        yield f"Фудграм - Список покупок | {now.strftime('%d.%m.%Y %H:%M')}"
+        yield f"Пользователь: {user.username}"
+        yield ""
+        yield "Ингредиенты:"
+        for i, ingredient in enumerate(ingredients, 1):
+            yield (
+                f"{i}. {ingredient['ingredient__name'].title()} - "
+                f"{ingredient['total_amount']} "
+                f"{ingredient['ingredient__measurement_unit']}"
+            )
+        yield ""
+        yield "Рецепты:"
+        for name, first_name, last_name in recipes:
+            yield f"- {name} (автор: {first_name} {last_name})"
+        yield ""
+        yield f"© Foodgram {now.year}"
+
+    def stream(self, user, ingredients, recipes):
+        for line in self.lines(user, ingredients, recipes):
+            yield f"{line}\n".encode(self.charset)
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, user, ingredients, recipes):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Продукт', 'Количество', 'Единица измерения')
+        ).encode(self.charset)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['total_amount'],
+                ingredient['ingredient__measurement_unit'],
+            )).encode(self.charset)
+
+
+class PDFShoppingListRenderer(TextShoppingListRenderer):
+    """Список покупок в PDF.
+
+    Таблица ссылок PDF пишется в конец файла, поэтому документ сначала
+    собирается во временный файл (в памяти только до 1 МБ), а затем
+    отдаётся частями.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    chunk_size = 64 * 1024
+
+    def stream(self, user, ingredients, recipes):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        with SpooledTemporaryFile(max_size=1024 * 1024) as file:
+            pdf = canvas.Canvas(file, pagesize=A4)
+            width, height = A4
+            y = height - self.margin
+            pdf.setFont(self.font_name, self.font_size)
+            for line in self.lines(user, ingredients, recipes):
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(self.font_name, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, line)
+                y -= self.font_size * 1.5
+            pdf.save()
+            file.seek(0)
+            while chunk := file.read(self.chunk_size):
+                yield chunk
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def id_list_field():
+    return serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        default=list,
+        max_length=settings.BULK_OPERATION_MAX_ITEMS,
+    )
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    """id объектов для массового добавления (add) и удаления (remove)."""
+    add = id_list_field()
+    remove = id_list_field()
+
+    def validate(self, data):
+        add = list(dict.fromkeys(data['add']))
+        remove = list(dict.fromkeys(data['remove']))
+        if not add and not remove:
+            raise ValidationError('Передайте id в add или remove')
+        conflicts = sorted(set(add) & set(remove))
+        if conflicts:
+            raise ValidationError(
+                f'id {conflicts} одновременно указаны в add и remove'
+            )
+        return {'add': add, 'remove': remove}
+
+
+def bulk_results(data, created, existing, removed, errors=None):
+    """Результат по каждому id в порядке запроса.
+
+    add: created, exists или not_found (либо статус из errors),
+    remove: removed или not_found.
+    """
+    errors = errors or {}
+
+    def add_status(pk):
+        if pk in errors:
+            return errors[pk]
+        if pk in created:
+            return 'created'
+        return 'exists' if pk in existing else 'not_found'
+
+    return {
+        'add': [
+            {'id': pk, 'status': add_status(pk)} for pk in data['add']
+        ],
+        'remove': [
+            {'id': pk, 'status': 'removed' if pk in removed else 'not_found'}
+            for pk in data['remove']
+        ],
+    }
@@ -0,0 +1,41 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from recipes.renditions import SOURCE, renditions_field
+
+
+class ImageUploadField(Base64ImageField):
+    """Изображение строкой base64 или файлом из multipart/form-data."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+
+class RenditionImageField(serializers.ImageField):
+    """Ссылка на уменьшенную копию изображения.
+
+    Пока копии не построены, отдаётся ссылка на оригинал.
+    """
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs.setdefault('read_only', True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        renditions = getattr(
+            value.instance, renditions_field(value.field.name), None
+        ) or {}
+        if (renditions.get(SOURCE) != value.name
+                or self.rendition not in renditions):
+            return super().to_representation(value)
+        url = value.storage.url(renditions[self.rendition])
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,9 +1,14 @@
+import json
+
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.http import QueryDict
 from rest_framework import serializers
 from api.serializers.users import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from api.serializers.fields import ImageUploadField, RenditionImageField
 
 from recipes.models import (Ingredient, Recipe, IngredientInRecipe,
-                     Favorite, ShoppingCart)
+                     Favorite, ShoppingCart, ShoppingCartIngredient)
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -14,10 +19,26 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
 
+class IngredientInRecipeListSerializer(serializers.ListSerializer):
+    """Находит все продукты рецепта одним запросом."""
+
+    def validate(self, attrs):
+        ids = {item['ingredient'] for item in attrs}
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = sorted(ids - ingredients.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Продукты с id {missing} не найдены'
+            )
+        for item in attrs:
+            item['ingredient'] = ingredients[item['ingredient']]
+        return attrs
+
+
 class IngredientInRecipeWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
+    id = serializers.IntegerField(
         source="ingredient",
+        min_value=1,
     )
     amount = serializers.IntegerField(
         required=True,
@@ -27,6 +48,7 @@ class IngredientInRecipeWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientInRecipe
         fields = ("id", "amount")
+        list_serializer_class = IngredientInRecipeListSerializer
 
 
 class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
@@ -43,6 +65,7 @@ class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
 
 class RecipeReadSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
+    image = RenditionImageField('full')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     ingredients = IngredientInRecipeReadSerializer(
@@ -58,8 +81,15 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
         )
         fields = read_only_fields
-    
+
+    def to_representation(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
+
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         request = self.context.get('request')
         return Favorite.objects.filter(
             user=request.user.id,
@@ -67,16 +97,35 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         request = self.context.get('request')
         return ShoppingCart.objects.filter(
             user=request.user.id,
             recipe=recipe
         ).exists()
-    
+
+
+class RecipeListSerializer(RecipeReadSerializer):
+    """Карточка рецепта в списке: фото уменьшено до размера card."""
+    image = RenditionImageField('card')
+
+
+class RecipeMatchSerializer(RecipeListSerializer):
+    """Рецепт из подбора по продуктам с оценкой совпадения."""
+    matched_ingredients = serializers.IntegerField(source='matched')
+    missing_ingredients = serializers.IntegerField(source='missing')
+    match_score = serializers.FloatField(source='score')
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + (
+            'matched_ingredients', 'missing_ingredients', 'match_score'
+        )
+        read_only_fields = fields
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(required=True)
+    image = ImageUploadField(required=True)
 
     ingredients = IngredientInRecipeWriteSerializer(
         source='ingredients_in_recipe',
@@ -90,8 +139,31 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, recipe):
+        prefetch_related_objects([recipe], Prefetch(
+            'ingredients_in_recipe',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ))
         return RecipeReadSerializer(recipe, context=self.context).data
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            # В multipart/form-data продукты приходят JSON-строкой,
+            # validate() дальше работает с уже разобранными данными.
+            data = self.initial_data = self.parse_form_data(data)
+        return super().to_internal_value(data)
+
+    def parse_form_data(self, data):
+        data = data.dict()
+        ingredients = data.get('ingredients')
+        if isinstance(ingredients, str):
+            try:
+                data['ingredients'] = json.loads(ingredients)
+            except ValueError:
+                raise serializers.ValidationError({
+                    'ingredients': 'Ожидается JSON-список продуктов'
+                })
+        return data
+
     def add_ingredients(self, recipe, ingredient_data):
         IngredientInRecipe.objects.bulk_create(
             IngredientInRecipe(
@@ -101,18 +173,61 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
             for ingredient in ingredient_data
         )
+        # bulk_create не отправляет сигналы, счётчики обновляем сами.
+        Ingredient.objects.filter(id__in=[
+            ingredient['ingredient'].id for ingredient in ingredient_data
+        ]).update(recipes_count=F('recipes_count') + 1)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            ingredients_count=F('ingredients_count') + len(ingredient_data)
+        )
 
     def create(self, validated_data):
         ingredient_data = validated_data.pop('ingredients_in_recipe')
-        recipe = super().create(validated_data)
-        self.add_ingredients(recipe, ingredient_data)
+        with transaction.atomic():
+            recipe = super().create(validated_data)
+            self.add_ingredients(recipe, ingredient_data)
         return recipe
 
+    def update_ingredients(self, recipe, ingredient_data):
+        """Меняет только отличающиеся строки продуктов рецепта."""
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredients_in_recipe.all()
+        }
+        amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredient_data
+        }
+        deltas = {}
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id, 0)
+            if amount != item.amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        added = [
+            ingredient for ingredient in ingredient_data
+            if ingredient['ingredient'].id not in current
+        ]
+        for ingredient in added:
+            deltas[ingredient['ingredient'].id] = ingredient['amount']
+
+        removed = [item.pk for item in changed if not item.amount]
+        changed = [item for item in changed if item.amount]
+        if removed:
+            IngredientInRecipe.objects.remove_items(recipe.id, removed)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        if added:
+            self.add_ingredients(recipe, added)
+        ShoppingCartIngredient.objects.apply_recipe_changes(recipe.id, deltas)
+
     def update(self, instance, validated_data):
         ingredient_data = validated_data.pop('ingredients_in_recipe')
-        instance.ingredients_in_recipe.all().delete()
-        self.add_ingredients(instance, ingredient_data)
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            self.update_ingredients(instance, ingredient_data)
+            return super().update(instance, validated_data)
 
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
@@ -1,15 +1,33 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from api.serializers.fields import ImageUploadField, RenditionImageField
 from recipes.models import Subscription, Recipe
 
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса, None — без ограничения."""
+    limit = request.query_params.get('recipes_limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Ожидается неотрицательное целое число'}
+        )
+    return limit
+
+
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar = RenditionImageField('thumbnail')
 
     class Meta:
         model = User
@@ -20,6 +38,8 @@ class UserSerializer(DjoserUserSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -32,7 +52,7 @@ class UserSerializer(DjoserUserSerializer):
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
     class Meta:
         model = User
@@ -41,8 +61,7 @@ class UserAvatarSerializer(serializers.ModelSerializer):
 
 class UserWithRecipesSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + (
@@ -52,10 +71,11 @@ class UserWithRecipesSerializer(UserSerializer):
         read_only_fields = fields
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit', 10**10)
-        recipes = obj.recipes.all()
-        recipes = recipes[:int(limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.all()[:limit]
         return ShortRecipeSerializer(
             recipes,
             many=True,
@@ -63,6 +83,8 @@ class UserWithRecipesSerializer(UserSerializer):
         ).data
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image = RenditionImageField('thumbnail')
+
     class Meta:
         model = Recipe
         fields = (
@@ -0,0 +1,379 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from api.serializers.recipes import RecipeWriteSerializer
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingCartIngredient, User)
+from recipes.renditions import SOURCE
+
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-tests',
+    }
+}
+
+
+def create_recipe(author, ingredients, number=0):
+    """Рецепт без построения копий фото: файла изображения в тестах нет."""
+    image = 'recipes/test.jpg'
+    recipe = Recipe.objects.create(
+        name=f'Рецепт {number}',
+        text='Описание',
+        image=image,
+        image_renditions={SOURCE: image},
+        author=author,
+        cooking_time=10,
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class RecipeQueryCountTests(APITestCase):
+    """Число запросов списка и страницы рецепта не зависит от размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@test.local', username='reader',
+            first_name='Имя', last_name='Фамилия', password='pw-123456',
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@test.local', username=f'author{i}',
+                first_name='Имя', last_name='Фамилия', password='pw-123456',
+            )
+            for i in range(5)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'продукт {i}',
+                                      measurement_unit='г')
+            for i in range(10)
+        ]
+        cls.recipes = [
+            create_recipe(authors[i % 5], ingredients[i % 7:i % 7 + 4], i)
+            for i in range(50)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_count_does_not_depend_on_limit(self):
+        for limit in (1, 50):
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                response = self.client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail_query_count(self):
+        for recipe in (self.recipes[0], self.recipes[-1]):
+            with self.subTest(recipe=recipe.id), self.assertNumQueries(3):
+                response = self.client.get(f'/api/recipes/{recipe.id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['ingredients']), 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IngredientChangeTests(APITestCase):
+    """Изменение каталога продуктов видно в кэше и ETag рецептов."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            email='author@test.local', username='author',
+            first_name='Имя', last_name='Фамилия', password='pw-123456',
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        self.recipe = create_recipe(author, [self.ingredient])
+
+    def rename_ingredient(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'мука пшеничная'
+            self.ingredient.save()
+
+    def ingredient_names(self, response):
+        return [item['name'] for item in response.data['ingredients']]
+
+    def test_anonymous_cache(self):
+        detail = f'/api/recipes/{self.recipe.id}/'
+        self.client.get('/api/recipes/')
+        self.client.get(detail)
+
+        self.rename_ingredient()
+
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.ingredient_names(response), ['мука пшеничная'])
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_etag(self):
+        detail = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(detail)['ETag']
+
+        self.rename_ingredient()
+
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified(self):
+        detail = f'/api/recipes/{self.recipe.id}/'
+        last_modified = self.client.get(detail)['Last-Modified']
+        self.assertEqual(
+            self.client.get(
+                detail, HTTP_IF_MODIFIED_SINCE=last_modified
+            ).status_code,
+            304
+        )
+
+        later = timezone.now() + timedelta(minutes=1)
+        with patch('recipes.ingredient_index.timezone.now',
+                   return_value=later):
+            self.rename_ingredient()
+
+        response = self.client.get(
+            detail, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ingredient_names(response), ['мука пшеничная'])
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class InvalidIdTests(APITestCase):
+    """Нечисловой id в URL даёт 404, а не ошибку сервера."""
+
+    def test_not_found(self):
+        user = User.objects.create_user(
+            email='reader@test.local', username='reader',
+            first_name='Имя', last_name='Фамилия', password='pw-123456',
+        )
+        for authenticated in (False, True):
+            if authenticated:
+                self.client.force_authenticate(user)
+            for url in ('/api/recipes/abc/', '/api/users/abc/'):
+                with self.subTest(url=url, authenticated=authenticated):
+                    self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class RecipeMatchTests(APITestCase):
+    """Подбор рецептов по продуктам считает недостающие продукты."""
+
+    def setUp(self):
+        author = User.objects.create_user(
+            email='author@test.local', username='author',
+            first_name='Имя', last_name='Фамилия', password='pw-123456',
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=f'продукт {i}',
+                                      measurement_unit='г')
+            for i in range(4)
+        ]
+        self.recipes = [create_recipe(author, [], i) for i in range(2)]
+        for recipe, ingredients in zip(
+            self.recipes, (self.ingredients[:2], self.ingredients)
+        ):
+            for ingredient in ingredients:
+                IngredientInRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+
+    def match(self, ingredients):
+        response = self.client.get(
+            '/api/recipes/by_ingredients/?ingredients='
+            + ','.join(str(ingredient.id) for ingredient in ingredients)
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item['id'], item['matched_ingredients'],
+             item['missing_ingredients'])
+            for item in response.data['results']
+        ]
+
+    def test_complete_recipes_first(self):
+        self.assertEqual(self.match(self.ingredients[:2]), [
+            (self.recipes[0].id, 2, 0),
+            (self.recipes[1].id, 2, 2),
+        ])
+
+    def test_missing_follows_ingredient_changes(self):
+        self.recipes[1].ingredients_in_recipe.get(
+            ingredient=self.ingredients[3]
+        ).delete()
+        IngredientInRecipe.objects.create(
+            recipe=self.recipes[0], ingredient=self.ingredients[2], amount=1
+        )
+
+        self.assertEqual(self.match(self.ingredients[:3]), [
+            (self.recipes[1].id, 3, 0),
+            (self.recipes[0].id, 3, 0),
+        ])
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class ConcurrentToggleTests(TransactionTestCase):
+    """Одновременные POST и DELETE одной пары срабатывают ровно раз."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.user, self.author = [
+            User.objects.create_user(
+                email=f'{name}@test.local', username=name,
+                first_name='Имя', last_name='Фамилия', password='pw-123456',
+            )
+            for name in ('reader', 'author')
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'продукт {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+        self.recipe = create_recipe(self.author, ingredients)
+
+    def send_concurrently(self, method, url):
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=send) for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assertToggledOnce(self, url, state, added, removed):
+        """Проверяет POST и DELETE из нескольких потоков и state()."""
+        self.assertEqual(
+            self.send_concurrently('post', url),
+            [201] + [400] * (self.THREADS - 1)
+        )
+        self.assertEqual(state(), added)
+        self.assertEqual(
+            self.send_concurrently('delete', url),
+            [204] + [404] * (self.THREADS - 1)
+        )
+        self.assertEqual(state(), removed)
+
+    def test_favorite(self):
+        self.assertToggledOnce(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            lambda: Recipe.objects.get(pk=self.recipe.pk).favorites_count,
+            1, 0
+        )
+
+    def test_shopping_cart(self):
+        self.assertToggledOnce(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            lambda: sorted(ShoppingCartIngredient.objects.filter(
+                user=self.user
+            ).values_list('ingredient_id', 'amount')),
+            sorted(self.recipe.ingredients_in_recipe.values_list(
+                'ingredient_id', 'amount'
+            )),
+            []
+        )
+
+    def test_subscribe(self):
+        self.assertToggledOnce(
+            f'/api/users/{self.author.id}/subscribe/',
+            lambda: (
+                User.objects.get(pk=self.author.pk).followers_count,
+                User.objects.get(pk=self.user.pk).following_count,
+            ),
+            (1, 1), (0, 0)
+        )
+
+
+class RecipeIngredientUpdateTests(APITestCase):
+    """Удаление продуктов из рецепта не стоит запроса на строку."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@test.local', username='author',
+            first_name='Имя', last_name='Фамилия', password='pw-123456',
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=f'продукт {i}',
+                                      measurement_unit='г')
+            for i in range(30)
+        ]
+
+    def create_recipe(self, number):
+        recipe = create_recipe(self.author, [], number)
+        for ingredient in self.ingredients:
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=5
+            )
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        return recipe
+
+    def update_queries(self, recipe, keep):
+        data = [
+            {'ingredient': ingredient, 'amount': 7}
+            for ingredient in self.ingredients[:keep]
+        ]
+        with CaptureQueriesContext(connection) as context:
+            RecipeWriteSerializer().update_ingredients(recipe, data)
+        return len(context.captured_queries)
+
+    def test_removal_query_count(self):
+        self.assertEqual(
+            self.update_queries(self.create_recipe(0), keep=29),
+            self.update_queries(self.create_recipe(1), keep=1),
+        )
+
+    def test_denormalized_data(self):
+        recipe = self.create_recipe(0)
+        self.update_queries(recipe, keep=3)
+
+        shopping_list = sorted(ShoppingCartIngredient.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ))
+        self.assertEqual(len(shopping_list), 3)
+        ShoppingCartIngredient.objects.rebuild()
+        self.assertEqual(shopping_list, sorted(
+            ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        ))
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe.pk).ingredients_count, 3
+        )
+        self.assertEqual(
+            list(Ingredient.objects.order_by('pk').values_list(
+                'recipes_count', flat=True
+            )),
+            [1] * 3 + [0] * 27
+        )
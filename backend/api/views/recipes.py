@@ -1,55 +1,184 @@
-from datetime import datetime
-
 from rest_framework import viewsets
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
-from django.http import Http404, FileResponse
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, Prefetch
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 
-from api.serializers.recipes import (RecipeWriteSerializer, RecipeReadSerializer,
+from api.serializers.recipes import (RecipeWriteSerializer,
+                                     RecipeReadSerializer,
+                                     RecipeListSerializer,
+                                     RecipeMatchSerializer,
                                      IngredientSerializer)
 from api.serializers.users import ShortRecipeSerializer
+from api.serializers.bulk import BulkOperationSerializer, bulk_results
 from recipes.models import (Recipe, Ingredient, IngredientInRecipe,
-                     Favorite, ShoppingCart)
+                     Favorite, ShoppingCart, ShoppingCartIngredient)
+from recipes.feed import feed_queryset
+from recipes.ingredient_index import ingredient_index
 from api.permissions import IsAuthorOrReadOnly
-from api.pagination import LimitPageNumberPagination
+from api.pagination import (CachedCountPagination, CursorPaginationMixin,
+                            LimitCursorPagination, LimitPageNumberPagination)
 from api.filters import RecipeFilter
+from api.renderers import SHOPPING_LIST_RENDERERS
+from api.cache import AnonymousResponseCacheMixin, response_cache_stats
+from api.conditional import ConditionalGetMixin
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = None
+    conditional_actions = ('list', 'retrieve')
 
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
-        if name:
-            queryset = queryset.filter(name__startswith=name)
-        return queryset
+    def get_validators(self, request, **kwargs):
+        return (
+            f'ingredients:{ingredient_index.catalogue_version()}',
+            None
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.search, request, *args, **kwargs
+        )
+
+    def search(self, request, *args, **kwargs):
+        return Response(
+            ingredient_index.search(request.query_params.get('name'))
+        )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousResponseCacheMixin,
+                    CursorPaginationMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = LimitPageNumberPagination
+    pagination_class = CachedCountPagination
     permission_classes = [IsAuthorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ["list", "retrieve", "by_ingredients", "feed"]:
+            queryset = queryset.with_user_flags(
+                self.request.user
+            ).select_related('author').prefetch_related(
+                Prefetch(
+                    'ingredients_in_recipe',
+                    queryset=IngredientInRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+        return queryset
+
+    def get_validators(self, request, **kwargs):
+        try:
+            pk = int(kwargs.get(self.lookup_field))
+        except (TypeError, ValueError):
+            # Некорректный id превратит в 404 обычный get_object().
+            return None, None
+        recipe = Recipe.objects.filter(pk=pk).with_user_flags(
+            request.user
+        ).values(
+            'updated_at', 'author__updated_at', 'is_favorited',
+            'is_in_shopping_cart', 'author_is_subscribed'
+        ).first()
+        if recipe is None:
+            return None, None
+        # Рецепт показывает названия и единицы продуктов из каталога.
+        catalogue = ingredient_index.catalogue_state()
+        last_modified = max(
+            recipe['updated_at'], recipe['author__updated_at'],
+            catalogue['changed_at']
+        )
+        return (
+            f'recipe:{pk}:'
+            + ':'.join(str(value) for value in recipe.values())
+            + f':ingredients:{catalogue["version"]}',
+            None if request.user.is_authenticated else last_modified
+        )
+
     def get_serializer_class(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "feed"]:
+            return RecipeListSerializer
+        if self.action == "by_ingredients":
+            return RecipeMatchSerializer
+        if self.action == "retrieve":
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='cache_stats',
+        permission_classes=(permissions.IsAdminUser,)
+    )
+    def cache_stats(self, request):
+        return Response(response_cache_stats())
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=LimitCursorPagination
+    )
+    def feed(self, request):
+        recipes = self.paginate_queryset(
+            feed_queryset(request.user, self.get_queryset())
+        )
+        return self.get_paginated_response(
+            self.get_serializer(recipes, many=True).data
+        )
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='by_ingredients',
+        permission_classes=(permissions.AllowAny,)
+    )
+    def by_ingredients(self, request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for param in request.query_params.getlist('ingredients')
+                for value in param.split(',') if value.strip()
+            }
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Ожидается список id продуктов через запятую'}
+            )
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': 'Обязательный параметр'})
+
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(
+            IngredientInRecipe.objects.match_recipes(ingredient_ids),
+            request,
+            view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [row['recipe'] for row in page]
+        )
+        matches = []
+        for row in page:
+            recipe = recipes[row['recipe']]
+            recipe.matched = row['matched']
+            recipe.missing = row['missing']
+            recipe.score = row['score']
+            matches.append(recipe)
+        return paginator.get_paginated_response(
+            self.get_serializer(matches, many=True).data
+        )
+
     @action(
         methods=['GET'],
         detail=True,
@@ -65,21 +194,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({"short-link": short_url})
 
     def _handle_recipe_action(self, request, recipe_id, model):
+        # Добавление и удаление — один INSERT ... ON CONFLICT или
+        # DELETE ... RETURNING, без гонки между проверкой и записью.
         user = request.user
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
+        try:
+            recipe_id = int(recipe_id)
+        except ValueError:
+            raise Http404
 
         if request.method != 'POST':
-            get_object_or_404(
-                model,
-                user=user,
-                recipe=recipe
-            ).delete()
+            with transaction.atomic():
+                if not model.objects.remove_recipes(user.id, [recipe_id]):
+                    raise Http404
             return Response(status=status.HTTP_204_NO_CONTENT)
-        
-        obj, created = model.objects.get_or_create(
-            user=user,
-            recipe=recipe
-        )
+
+        with transaction.atomic():
+            created = model.objects.add_recipes(user.id, [recipe_id])
+        recipe = get_object_or_404(Recipe, pk=recipe_id)
 
         if not created:
             return Response(
@@ -91,8 +222,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShortRecipeSerializer(recipe).data,
             status=status.HTTP_201_CREATED
         )
-        
-        
 
     @action(
         methods=["POST", "DELETE"],
@@ -112,52 +241,76 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, pk=None):
         return self._handle_recipe_action(request, pk, ShoppingCart)
 
-    def generate_shopping_cart(self, ingredients, recipes, user):
-        current_date = datetime.now().strftime("%d.%m.%Y %H:%M")
-    
-        content = [
-            f"Фудграм - Список покупок | {current_date}",
-            f"Пользователь: {user.username}\n",
-            "Ингредиенты:"
-        ]
-        
-        for i, ingredient in enumerate(ingredients, 1):
-            content.append(
-                f"{i}. {ingredient['ingredient__name'].title()} - "
-                f"{ingredient['total_amount']} "
-                f"{ingredient['ingredient__measurement_unit']}"
+    def _handle_bulk_recipe_action(self, request, model):
+        serializer = BulkOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with transaction.atomic():
+            removed = model.objects.remove_recipes(
+                request.user.id, data['remove']
             )
-        
-        content.extend([
-            "\nРецепты:",
-            *[f"- {recipe.name} (автор: {recipe.author.get_full_name()})" 
-            for recipe in recipes.distinct()],
-            f"\n© Foodgram {datetime.now().year}"
-        ])
-        
-        return FileResponse(
-            "\n".join(content),
-            as_attachment=True,
-            filename="shopping_list.txt",
-            content_type="text/plain",
-        )
+            created = model.objects.add_recipes(request.user.id, data['add'])
+        existing = Recipe.objects.filter(
+            pk__in=set(data['add']) - set(created)
+        ).values_list('pk', flat=True)
+        return Response(bulk_results(
+            data, set(created), set(existing), set(removed)
+        ))
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='favorite/bulk'
+    )
+    def favorite_bulk(self, request):
+        return self._handle_bulk_recipe_action(request, Favorite)
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path='shopping_cart/bulk'
+    )
+    def shopping_cart_bulk(self, request):
+        return self._handle_bulk_recipe_action(request, ShoppingCart)
 
     @action(
         methods=['GET'],
         detail=False,
         url_path='download_shopping_cart',
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
         user = request.user
-        recipes = Recipe.objects.filter(shoppingcarts__user=user)
-
         ingredients = (
-            IngredientInRecipe.objects
-            .filter(recipe__in=recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
+            ShoppingCartIngredient.objects
+            .filter(user=user)
+            .values(
+                'ingredient__name',
+                'ingredient__measurement_unit',
+                total_amount=F('amount')
+            )
             .order_by('ingredient__name')
         )
+        recipes = (
+            Recipe.objects
+            .filter(shoppingcarts__user=user)
+            .values_list('name', 'author__first_name', 'author__last_name')
+        )
 
-        return self.generate_shopping_cart(ingredients, recipes, user)
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(
+                user, ingredients.iterator(), recipes.iterator()
+            ),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        return response
@@ -4,18 +4,44 @@ from rest_framework.exceptions import ValidationError
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.serializers.users import UserAvatarSerializer, UserWithRecipesSerializer
-from api.pagination import LimitPageNumberPagination
+from collections import defaultdict
+
+from api.serializers.bulk import BulkOperationSerializer, bulk_results
+from api.serializers.users import (UserAvatarSerializer,
+                                   UserWithRecipesSerializer,
+                                   get_recipes_limit)
+from api.conditional import ConditionalGetMixin
+from api.pagination import CursorPaginationMixin, LimitPageNumberPagination
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from recipes.models import Subscription
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from recipes.models import Recipe, Subscription
 
 
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(ConditionalGetMixin, CursorPaginationMixin,
+                  DjoserUserViewSet):
     pagination_class = LimitPageNumberPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    conditional_actions = ('retrieve', 'me')
+
+    def get_validators(self, request, **kwargs):
+        if self.action == 'me':
+            return f'user:{request.user.pk}:{request.user.updated_at}', None
+        try:
+            pk = int(kwargs.get(self.lookup_field))
+        except (TypeError, ValueError):
+            # Некорректный id превратит в 404 обычный get_object().
+            return None, None
+        user = User.objects.filter(pk=pk).annotate(is_subscribed=Exists(Subscription.objects.filter(
+            follower=request.user.id, author=OuterRef('pk')
+        ))).values('pk', 'updated_at', 'is_subscribed').first()
+        if user is None:
+            return None, None
+        return 'user:' + ':'.join(str(value) for value in user.values()), None
 
     @action(
         methods=["GET"],
@@ -70,10 +96,21 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
+        limit = get_recipes_limit(request)
         subscriptions = User.objects.filter(
             authors__follower=user
-        ).prefetch_related("recipes")
+        ).annotate(is_subscribed=Value(True, output_field=BooleanField()))
         pages = self.paginate_queryset(subscriptions)
+
+        recipes = Recipe.objects.filter(author__in=pages)
+        if limit is not None:
+            recipes = recipes.limited_per_author(limit)
+        recipes_by_author = defaultdict(list)
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author in pages:
+            author.limited_recipes = recipes_by_author[author.id]
+
         serializer = self.get_serializer(
             pages,
             many=True,
@@ -89,31 +126,59 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscribe(self, request, id=None):
         user = request.user
-        author = get_object_or_404(User, id=id)
+        try:
+            author_id = int(id)
+        except ValueError:
+            raise Http404
 
         if request.method != 'POST':
-            get_object_or_404(
-                Subscription, follower=user, author=author
-            ).delete()
+            with transaction.atomic():
+                if not Subscription.objects.remove_authors(
+                    user.id, [author_id]
+                ):
+                    raise Http404
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if user == author:
+        if author_id == user.id:
             raise ValidationError('Невозможно подписаться на себя')
 
-        subscription, created = Subscription.objects.get_or_create(
-            follower=user,
-            author=author
-        )
+        with transaction.atomic():
+            created = Subscription.objects.add_authors(user.id, [author_id])
+        author = get_object_or_404(User, id=author_id)
         if not created:
             raise ValidationError(
                 f'Невозможно подписаться на {author.username} дважды'
             )
 
         serializer = self.get_serializer(
-            subscription.author,
+            author,
             context={'request': request}
         )
         return Response(
             data=serializer.data,
             status=status.HTTP_201_CREATED
         )
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='subscribe/bulk',
+    )
+    def subscribe_bulk(self, request):
+        serializer = BulkOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+        with transaction.atomic():
+            removed = Subscription.objects.remove_authors(
+                user.id, data['remove']
+            )
+            created = Subscription.objects.add_authors(user.id, data['add'])
+        existing = User.objects.filter(
+            pk__in=set(data['add']) - set(created)
+        ).values_list('pk', flat=True)
+        return Response(bulk_results(
+            data, set(created), set(existing), set(removed),
+            errors={user.id: 'self'},
+        ))
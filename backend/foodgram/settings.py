@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'djoser',
@@ -98,6 +99,21 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        # По умолчанию Django держит 300 записей: ответы по каждому URL
+        # и кэш count быстро вытеснили бы остальные ключи.
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100_000)),
+        },
+    }
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -120,6 +136,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загружаемые файлы сразу пишутся во временный файл, а не в память.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -137,6 +158,37 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+INGREDIENT_SEARCH_LIMIT = 20
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = 300
+
+BULK_OPERATION_MAX_ITEMS = 500
+
+PAGINATION_ESTIMATE_COUNT_THRESHOLD = 100_000
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Лента подписок: read — join при чтении, write — fan-out при публикации.
+# После смены на write ленты нужно собрать командой rebuild_feeds.
+RECIPE_FEED_STRATEGY = os.getenv('RECIPE_FEED_STRATEGY', 'read')
+
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (640, 640),
+    'full': (1600, 1600),
+}
+
+IMAGE_RENDITION_FORMAT = os.getenv('IMAGE_RENDITION_FORMAT', 'WEBP')
+
+IMAGE_RENDITION_QUALITY = 82
+
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     "SERIALIZERS": {
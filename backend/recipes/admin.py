@@ -7,9 +7,9 @@ from .models import (Recipe, Ingredient, IngredientInRecipe,
 
 
 class RecipesCountMixin:
-    @admin.display(description="Рецепты")
+    @admin.display(description="Рецепты", ordering="recipes_count")
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class BaseHasFilter(admin.SimpleListFilter):
@@ -131,13 +131,13 @@ class SiteUserAdmin(UserAdmin, RecipesCountMixin):
             return f'<img src="{obj.avatar.url}" width="50" height="50" />'
         return ""
 
-    @admin.display(description="Подписчики")
+    @admin.display(description="Подписчики", ordering="followers_count")
     def get_number_of_followers(self, user_obj):
-        return user_obj.authors.count()
+        return user_obj.followers_count
 
-    @admin.display(description="Подписки")
+    @admin.display(description="Подписки", ordering="following_count")
     def get_number_of_following(self, user_obj):
-        return user_obj.followers.count()
+        return user_obj.following_count
 
 
 @admin.register(Subscription)
@@ -223,9 +223,9 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = (CookingTimeFilter, "author")
     inlines = (IngredientInRecipeInline,)
 
-    @admin.display(description="В избранном")
+    @admin.display(description="В избранном", ordering="favorites_count")
     def get_favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     @admin.display(description="Продукты")
     @mark_safe
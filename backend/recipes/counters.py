@@ -0,0 +1,45 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     Subscription, User)
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def increment_counters(model, field, deltas):
+    """Прибавляет к счётчику field объектов model {id: прибавка}.
+
+    Объекты с одинаковой прибавкой обновляются одним UPDATE.
+    """
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(pk__in=ids).update(**{field: F(field) + delta})
+
+
+def recalculate_counters():
+    """Пересчитывает все денормализованные счётчики с нуля."""
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite, 'recipe'),
+        ingredients_count=count_of(IngredientInRecipe, 'recipe'),
+    )
+    Ingredient.objects.update(
+        recipes_count=count_of(IngredientInRecipe, 'ingredient')
+    )
+    User.objects.update(
+        recipes_count=count_of(Recipe, 'author'),
+        followers_count=count_of(Subscription, 'author'),
+        following_count=count_of(Subscription, 'follower'),
+    )
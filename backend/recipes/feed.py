@@ -0,0 +1,28 @@
+"""Лента новых рецептов от авторов, на которых подписан пользователь.
+
+Стратегия задаётся настройкой RECIPE_FEED_STRATEGY:
+read — подписки соединяются с рецептами при каждом запросе,
+write — новый рецепт сразу раскладывается во входящие ленты (FeedItem)
+подписчиков, а чтение идёт только по ленте пользователя.
+"""
+from django.conf import settings
+
+from .models import Recipe, Subscription
+
+FEED_STRATEGY_READ = 'read'
+FEED_STRATEGY_WRITE = 'write'
+
+
+def fan_out_on_write():
+    return settings.RECIPE_FEED_STRATEGY == FEED_STRATEGY_WRITE
+
+
+def feed_queryset(user, queryset=None):
+    """Рецепты ленты пользователя; порядок задаёт курсорная пагинация."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    if fan_out_on_write():
+        return queryset.filter(feed_items__user=user)
+    return queryset.filter(author__in=Subscription.objects.filter(
+        follower=user
+    ).values('author'))
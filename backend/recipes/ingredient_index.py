@@ -0,0 +1,108 @@
+import threading
+from bisect import bisect_left
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Ingredient
+
+
+CATALOGUE_KEY = 'ingredients:catalogue'
+# Версия ещё не построенного индекса. Не None: с DummyCache версия
+# каталога всегда None, и индекс тогда не построился бы ни разу.
+NOT_LOADED = object()
+
+
+def normalize(name):
+    return name.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Отсортированный префиксный индекс каталога продуктов в памяти.
+
+    Индекс строится из таблицы Ingredient один раз и перестраивается,
+    когда меняется версия каталога в кэше, поэтому поиск по префиксу
+    не обращается к базе данных.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = NOT_LOADED
+        self._keys = []
+        self._items = []
+
+    def catalogue_state(self):
+        """Версия каталога и время его последнего изменения.
+
+        Версия — случайный токен, а не счётчик: после вытеснения ключа
+        из кэша она не повторит старое значение, и индекс, ETag и ключи
+        кэша ответов не совпадут с построенными по старому каталогу.
+        Время после вытеснения считается текущим, поэтому Last-Modified
+        рецептов может только вырасти.
+        """
+        state = cache.get(CATALOGUE_KEY)
+        if state is None:
+            cache.add(CATALOGUE_KEY, self._new_state(), timeout=None)
+            state = cache.get(CATALOGUE_KEY)
+        if state is None:
+            # Кэш ничего не хранит (DummyCache).
+            state = {'version': None, 'changed_at': timezone.now()}
+        return state
+
+    def catalogue_version(self):
+        return self.catalogue_state()['version']
+
+    def _new_state(self):
+        return {'version': uuid4().hex, 'changed_at': timezone.now()}
+
+    def invalidate(self):
+        cache.set(CATALOGUE_KEY, self._new_state(), timeout=None)
+        with self._lock:
+            self._version = NOT_LOADED
+
+    def _load(self):
+        version = self.catalogue_version()
+        if version == self._version:
+            return self._keys, self._items
+        with self._lock:
+            if version != self._version:
+                # Названия уникальны с учётом регистра и ё, поэтому ключи
+                # могут совпадать; словари продуктов не сравниваются.
+                entries = sorted(
+                    (
+                        (normalize(name), {
+                            'id': pk,
+                            'name': name,
+                            'measurement_unit': measurement_unit,
+                        })
+                        for pk, name, measurement_unit in
+                        Ingredient.objects.values_list(
+                            'id', 'name', 'measurement_unit'
+                        )
+                    ),
+                    key=lambda entry: (entry[0], entry[1]['id'])
+                )
+                self._keys = [key for key, _ in entries]
+                self._items = [item for _, item in entries]
+                self._version = version
+            return self._keys, self._items
+
+    def search(self, name=None, limit=None):
+        keys, items = self._load()
+        if not name:
+            return list(items)
+
+        prefix = normalize(name)
+        matches = []
+        for index in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[index].startswith(prefix):
+                break
+            matches.append((keys[index] != prefix, len(keys[index]), index))
+        matches.sort()
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        return [items[index] for *_, index in matches[:limit]]
+
+
+ingredient_index = IngredientIndex()
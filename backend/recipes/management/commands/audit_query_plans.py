@@ -0,0 +1,177 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment)
+from rest_framework.test import APIClient
+
+from recipes.management.seed import DUMMY_CACHES, SEED_PREFIX, seed_dataset
+from recipes.models import Ingredient, Recipe
+
+
+# .iterator() в PostgreSQL читает через именованный курсор.
+DECLARE_CURSOR = re.compile(
+    r'^\s*DECLARE\s+\S+\s+NO SCROLL CURSOR\s+(WITH(OUT)? HOLD\s+)?FOR\s+',
+    re.IGNORECASE
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка планов запросов основных эндпоинтов API: '
+        'падает, если в плане есть последовательное сканирование'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='Печатать планы всех запросов',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Аудит планов поддерживается только в PostgreSQL'
+            )
+
+        setup_test_environment()
+        # Кэш отключён, чтобы каждый эндпоинт выполнил все свои запросы.
+        with override_settings(CACHES=DUMMY_CACHES), transaction.atomic():
+            users = seed_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                ingredients_per_recipe=8,
+                favorites=20,
+                subscriptions=10,
+                cart=10,
+                seed=options['seed'],
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            failures = self.audit(users, options['show_plans'])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f'Последовательное сканирование в {failures} запросах'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Последовательных сканирований не найдено.'
+        ))
+
+    def endpoints(self, users):
+        user = users[0]
+        recipe = Recipe.objects.filter(author=user).first()
+        ingredient_ids = ','.join(
+            str(pk) for pk in Ingredient.objects.filter(
+                name__startswith=f'{SEED_PREFIX} '
+            ).values_list('pk', flat=True)[:3]
+        )
+        return {
+            'recipe_list': '/api/recipes/?limit=6',
+            'recipe_list_page': '/api/recipes/?limit=6&page=50',
+            'recipe_list_cursor': '/api/recipes/?limit=6&pagination=cursor',
+            'recipe_list_author': f'/api/recipes/?author={users[1].id}',
+            'recipe_list_favorited': '/api/recipes/?is_favorited=1',
+            'recipe_list_cart': '/api/recipes/?is_in_shopping_cart=1',
+            'recipe_search': '/api/recipes/?search=рецепт',
+            'recipe_detail': f'/api/recipes/{recipe.id}/',
+            'recipe_feed': '/api/recipes/feed/?limit=6',
+            'recipe_by_ingredients': (
+                f'/api/recipes/by_ingredients/?ingredients={ingredient_ids}'
+            ),
+            'user_detail': f'/api/users/{users[1].id}/',
+            'user_me': '/api/users/me/',
+            'subscriptions': (
+                '/api/users/subscriptions/?limit=6&recipes_limit=3'
+            ),
+            'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+        }
+
+    def capture(self, client, url):
+        reset_queries()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+        queries = (
+            DECLARE_CURSOR.sub('', query['sql'])
+            for query in context.captured_queries
+        )
+        return [
+            sql for sql in queries
+            if sql.lstrip().upper().startswith('SELECT')
+        ]
+
+    def explain(self, cursor, sql):
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def scans(self, node):
+        """Узлы плана, которые читают таблицу целиком.
+
+        Кроме Seq Scan это полный проход индекса только ради фильтра:
+        при enable_seqscan = off так выглядит отсутствующий индекс.
+        """
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan' or (
+            node_type in ('Index Scan', 'Index Only Scan')
+            and 'Index Cond' not in node and 'Filter' in node
+        ):
+            yield f'{node_type} on {node.get("Relation Name")}'
+        for child in node.get('Plans', ()):
+            yield from self.scans(child)
+
+    def format_plan(self, node, depth=0):
+        relation = node.get('Relation Name')
+        details = ', '.join(
+            f'{key}: {node[key]}' for key in ('Index Name', 'Index Cond',
+                                              'Filter')
+            if key in node
+        )
+        yield '  ' * depth + node['Node Type'] + (
+            f' on {relation}' if relation else ''
+        ) + (f' ({details})' if details else '')
+        for child in node.get('Plans', ()):
+            yield from self.format_plan(child, depth + 1)
+
+    def audit(self, users, show_plans):
+        client = APIClient()
+        client.force_authenticate(users[0])
+        failures = 0
+        for name, url in self.endpoints(users).items():
+            queries = self.capture(client, url)
+            with connection.cursor() as cursor:
+                # Без этого на небольших тестовых таблицах планировщик
+                # честно выбирает seq scan; с ним seq scan остаётся только
+                # там, где подходящего индекса нет.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                plans = [(sql, self.explain(cursor, sql)) for sql in queries]
+                cursor.execute('SET LOCAL enable_seqscan = on')
+            bad = [
+                (sql, plan) for sql, plan in plans
+                if any(self.scans(plan))
+            ]
+            failures += len(bad)
+            style = self.style.ERROR if bad else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: запросов {len(plans)}, с seq scan {len(bad)}'
+            ))
+            for sql, plan in (plans if show_plans else bad):
+                self.stdout.write(f'  {sql}')
+                for line in self.format_plan(plan):
+                    self.stdout.write(f'    {line}')
+        return failures
@@ -0,0 +1,132 @@
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment)
+from rest_framework.test import APIClient
+
+from recipes.management.seed import DUMMY_CACHES, SEED_PREFIX, seed_dataset
+from recipes.models import Recipe
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер количества запросов, задержки и аллокаций '
+        'для основных эндпоинтов API на синтетических данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--cart', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        with override_settings(CACHES=DUMMY_CACHES), transaction.atomic():
+            users = seed_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                favorites=options['favorites'],
+                subscriptions=options['subscriptions'],
+                cart=options['cart'],
+                seed=options['seed'],
+            )
+            recipe = Recipe.objects.filter(author=users[0]).first()
+            client = APIClient()
+            client.force_authenticate(users[0])
+            endpoints = {
+                'recipe_list': '/api/recipes/?limit=6',
+                'recipe_detail': f'/api/recipes/{recipe.id}/',
+                'subscriptions': (
+                    '/api/users/subscriptions/?limit=6&recipes_limit=3'
+                ),
+                'ingredient_search': f'/api/ingredients/?name={SEED_PREFIX}',
+                'download_shopping_cart': (
+                    '/api/recipes/download_shopping_cart/'
+                ),
+            }
+            results = {
+                name: self.measure(client, url, options['iterations'])
+                for name, url in endpoints.items()
+            }
+            transaction.set_rollback(True)
+
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'options': {
+                key: options[key] for key in (
+                    'users', 'recipes', 'ingredients',
+                    'ingredients_per_recipe', 'favorites', 'subscriptions',
+                    'cart', 'iterations', 'seed',
+                )
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["queries"]} запросов, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'пик аллокаций {result["peak_alloc_kb"]} КБ'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, url, iterations):
+        self.request(client, url)
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as context:
+            response = self.request(client, url)
+        # captured_queries читает общий журнал запросов, а каждый
+        # следующий запрос к API очищает его в request_started.
+        queries = len(context.captured_queries)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            self.request(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        self.request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'peak_alloc_kb': round(peak / 1024, 1),
+        }
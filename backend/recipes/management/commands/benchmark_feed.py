@@ -0,0 +1,209 @@
+import json
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework.test import APIClient
+
+from recipes.feed import (FEED_STRATEGY_READ, FEED_STRATEGY_WRITE,
+                          feed_queryset)
+from recipes.management.commands.benchmark_api import percentile
+from recipes.management.seed import SEED_PREFIX
+from recipes.models import FeedItem, Recipe, Subscription, User
+
+STRATEGIES = (FEED_STRATEGY_READ, FEED_STRATEGY_WRITE)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение стратегий ленты подписок (read/write): стоимость '
+        'публикации рецепта и чтения ленты в зависимости от числа подписчиков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', type=int, nargs='+',
+            default=[10, 100, 1000, 10000],
+            help='Числа подписчиков автора для замеров',
+        )
+        parser.add_argument(
+            '--following', type=int, default=50,
+            help='На скольких авторов подписан читатель',
+        )
+        parser.add_argument('--recipes-per-author', type=int, default=50)
+        parser.add_argument(
+            '--reads-per-recipe', type=float, default=100,
+            help='Сколько чтений лент приходится на одну публикацию',
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', default='benchmark_feed.json')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        results = []
+        for followers in options['followers']:
+            self.vacuum()
+            with transaction.atomic():
+                author, reader = self.seed(followers, options)
+                result = {'followers': followers}
+                for strategy in STRATEGIES:
+                    with override_settings(RECIPE_FEED_STRATEGY=strategy):
+                        result[strategy] = self.measure(
+                            author, reader, options['iterations']
+                        )
+                transaction.set_rollback(True)
+            for strategy in STRATEGIES:
+                measured = result[strategy]
+                # Стоимость на одну публикацию: сама публикация плюс
+                # чтения лент, которые приходятся на неё в среднем.
+                measured['cost_per_recipe_ms'] = round(
+                    measured['publish_ms']
+                    + options['reads_per_recipe'] * measured['read_p50_ms'],
+                    3
+                )
+            result['winner'] = min(
+                STRATEGIES, key=lambda name: result[name]['cost_per_recipe_ms']
+            )
+            results.append(result)
+
+        crossover = next((
+            current['followers'] for previous, current
+            in zip(results, results[1:])
+            if previous['winner'] != current['winner']
+        ), None)
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'options': {
+                key: options[key] for key in (
+                    'followers', 'following', 'recipes_per_author',
+                    'reads_per_recipe', 'iterations',
+                )
+            },
+            'results': results,
+            'crossover_followers': crossover,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        for result in results:
+            self.stdout.write(f'Подписчиков {result["followers"]}:')
+            for strategy in STRATEGIES:
+                measured = result[strategy]
+                self.stdout.write(
+                    f'  {strategy}: публикация {measured["publish_ms"]} мс, '
+                    f'чтение p50 {measured["read_p50_ms"]} мс, '
+                    f'на рецепт {measured["cost_per_recipe_ms"]} мс'
+                )
+            self.stdout.write(f'  выгоднее: {result["winner"]}')
+        self.stdout.write(
+            f'Точка смены стратегии: {crossover} подписчиков'
+            if crossover else 'Смены выгодной стратегии не обнаружено'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def vacuum(self):
+        """Убирает мёртвые строки прошлых откатанных замеров.
+
+        Иначе планировщик спотыкается о них в индексах, и время
+        планирования запроса ленты растёт от прогона к прогону.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        tables = ', '.join(
+            model._meta.db_table
+            for model in (FeedItem, Recipe, Subscription, User)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'VACUUM ANALYZE {tables}')
+
+    def seed(self, followers, options):
+        """Автор с followers подписчиками и читатель среди них.
+
+        Читатель, кроме того, подписан на --following авторов
+        с --recipes-per-author рецептами у каждого.
+        """
+        prefix = f'{SEED_PREFIX}_feed'
+        User.objects.bulk_create(
+            User(
+                email=f'{prefix}{i}@{SEED_PREFIX}.local',
+                username=f'{prefix}_{i}',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for i in range(1 + followers + options['following'])
+        )
+        users = list(
+            User.objects.filter(username__startswith=f'{prefix}_')
+            .order_by('id')
+        )
+        author, reader = users[0], users[1]
+        followed = users[1 + followers:]
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'{SEED_PREFIX} рецепт ленты {i}',
+                text='Синтетический рецепт для измерений.',
+                image='recipes/bench.jpg',
+                author=followed_author,
+                cooking_time=1,
+            )
+            for followed_author in followed
+            for i in range(options['recipes_per_author'])
+        )
+        Subscription.objects.bulk_create(
+            [
+                Subscription(follower=follower, author=author)
+                for follower in users[1:1 + followers]
+            ] + [
+                Subscription(follower=reader, author=followed_author)
+                for followed_author in followed
+            ]
+        )
+        FeedItem.objects.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return author, reader
+
+    def measure(self, author, reader, iterations):
+        """Медианы запроса страницы ленты и публикации рецепта.
+
+        Чтение замеряется на уровне запроса к базе: сериализация
+        одинакова для обеих стратегий и только добавила бы шум.
+        Чтение идёт первым, пока таблицы не распухли от удалённых
+        при замере публикаций строк.
+        """
+        client = APIClient()
+        client.force_authenticate(reader)
+        response = client.get('/api/recipes/feed/?limit=10')
+        page = feed_queryset(reader).order_by('-id').values_list(
+            'id', flat=True
+        )[:10]
+        reads = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            list(page.all())
+            reads.append((time.perf_counter() - started) * 1000)
+        publish = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            with transaction.atomic():
+                recipe = Recipe.objects.create(
+                    name=f'{SEED_PREFIX} новый рецепт {i}',
+                    text='Синтетический рецепт для измерений.',
+                    image='recipes/bench.jpg',
+                    author=author,
+                    cooking_time=1,
+                )
+            publish.append((time.perf_counter() - started) * 1000)
+            recipe.delete()
+
+        return {
+            'status': response.status_code,
+            'publish_ms': round(percentile(publish, 50), 3),
+            'read_p50_ms': round(percentile(reads, 50), 3),
+            'read_p95_ms': round(percentile(reads, 95), 3),
+        }
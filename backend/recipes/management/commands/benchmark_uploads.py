@@ -0,0 +1,199 @@
+import base64
+import json
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views.recipes import RecipeViewSet
+from api.views.users import UserViewSet
+from recipes.management.seed import SEED_PREFIX
+from recipes.models import Ingredient, User
+
+
+def make_image(size_mb, seed):
+    """PNG из шума: почти не сжимается, поэтому весит около size_mb."""
+    side = int((size_mb * 1024 * 1024 / 3) ** 0.5)
+    image = Image.frombytes(
+        'RGB', (side, side), random.Random(seed).randbytes(side * side * 3)
+    )
+    content = BytesIO()
+    image.save(content, 'PNG', compress_level=1)
+    return content.getvalue()
+
+
+def memory_status():
+    """VmRSS и VmHWM процесса в КБ из /proc/self/status."""
+    status = {}
+    with open('/proc/self/status') as file:
+        for line in file:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                status[key] = int(value.split()[0])
+    return status
+
+
+def reset_peak_rss():
+    with open('/proc/self/clear_refs', 'w') as file:
+        file.write('5')
+
+
+def run_forked(func):
+    """Выполняет func в дочернем процессе и возвращает его результат.
+
+    Каждый замер начинается с одинакового состояния памяти. Потомок
+    работает в транзакции родителя, пока тот ждёт, и завершается через
+    os._exit, не закрывая общее соединение с базой.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = func()
+        except Exception as error:
+            result = {'error': repr(error)}
+        with os.fdopen(write_fd, 'w') as pipe:
+            json.dump(result, pipe)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = json.loads(pipe.read() or '{"error": "нет результата"}')
+    os.waitpid(pid, 0)
+    if 'error' in result:
+        raise CommandError(f'Замер завершился ошибкой: {result["error"]}')
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение пикового потребления памяти при загрузке изображений '
+        'в base64 (JSON) и файлом (multipart/form-data)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=float, nargs='+', default=[1, 5, 9],
+            help='Размеры изображений в МБ',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='benchmark_uploads.json')
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork') or not os.path.exists('/proc/self/status'):
+            raise CommandError('Замер RSS поддерживается только в Linux')
+
+        setup_test_environment()
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    transaction.atomic():
+                user = User.objects.create(
+                    email=f'{SEED_PREFIX}_uploads@{SEED_PREFIX}.local',
+                    username=f'{SEED_PREFIX}_uploads',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                )
+                ingredient = Ingredient.objects.create(
+                    name=f'{SEED_PREFIX} ингредиент для загрузок',
+                    measurement_unit='г',
+                )
+                results = [
+                    self.measure(user, ingredient, size, endpoint, mode,
+                                 options['seed'])
+                    for size in options['sizes']
+                    for endpoint in ('recipe', 'avatar')
+                    for mode in ('base64', 'multipart')
+                ]
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        for result in results:
+            self.stdout.write(
+                f'{result["endpoint"]} {result["mode"]} '
+                f'{result["image_kb"]} КБ: статус {result["status"]}, '
+                f'пик RSS +{result["peak_rss_kb"]} КБ, '
+                f'пик аллокаций {result["peak_alloc_kb"]} КБ'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def build_request(self, user, ingredient, raw, endpoint, mode):
+        factory = APIRequestFactory()
+        if mode == 'base64':
+            image = 'data:image/png;base64,' + base64.b64encode(raw).decode()
+            ingredients = [{'id': ingredient.id, 'amount': 1}]
+            request_format = 'json'
+        else:
+            image = SimpleUploadedFile('photo.png', raw, 'image/png')
+            ingredients = json.dumps([{'id': ingredient.id, 'amount': 1}])
+            request_format = 'multipart'
+        if endpoint == 'avatar':
+            request = factory.put(
+                '/api/users/me/avatar/', {'avatar': image},
+                format=request_format,
+            )
+            view = UserViewSet.as_view({'put': 'avatar'})
+        else:
+            request = factory.post('/api/recipes/', {
+                'name': f'{SEED_PREFIX} загрузка',
+                'text': 'Замер загрузки',
+                'cooking_time': 1,
+                'ingredients': ingredients,
+                'image': image,
+            }, format=request_format)
+            view = RecipeViewSet.as_view({'post': 'create'})
+        force_authenticate(request, user)
+        return view, request
+
+    def measure(self, user, ingredient, size, endpoint, mode, seed):
+        raw = make_image(size, seed)
+        image_kb = round(len(raw) / 1024)
+        view, request = self.build_request(
+            user, ingredient, raw, endpoint, mode
+        )
+        del raw
+
+        def rss():
+            reset_peak_rss()
+            baseline = memory_status()['VmRSS']
+            response = view(request)
+            return {
+                'status': response.status_code,
+                'peak_rss_kb': memory_status()['VmHWM'] - baseline,
+            }
+
+        def allocations():
+            tracemalloc.start()
+            view(request)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {'peak_alloc_kb': round(peak / 1024, 1)}
+
+        return {
+            'endpoint': endpoint,
+            'mode': mode,
+            'image_kb': image_kb,
+            **run_forked(rss),
+            **run_forked(allocations),
+        }
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes import renditions
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных копий фото рецептов и аватарок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить копии, даже если они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        for model, field_name in ((Recipe, 'image'), (User, 'avatar')):
+            attribute = renditions.renditions_field(field_name)
+            queryset = model.objects.exclude(
+                **{f'{field_name}__in': ('', None)}
+            ).only('pk', field_name, attribute)
+            for instance in queryset.iterator():
+                name = getattr(instance, field_name).name
+                current = getattr(instance, attribute) or {}
+                if current.get(renditions.SOURCE) == name and not (
+                    options['force']
+                ):
+                    continue
+                renditions.process(model, instance.pk, field_name, name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии изображений построены: {built}.'
+        ))
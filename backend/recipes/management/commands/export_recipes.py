@@ -0,0 +1,88 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.management.ndjson import open_stream
+from recipes.models import IngredientInRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузка рецептов с авторами и продуктами в NDJSON '
+        '(по рецепту в строке)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='recipes.ndjson',
+            help='Файл NDJSON (.gz — сжатый), - — stdout',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Продолжить после рецепта с этим id, дописывая файл',
+        )
+
+    def handle(self, *args, **options):
+        last_id = options['after_id']
+        mode = 'a' if last_id else 'w'
+        exported = 0
+        with open_stream(options['output'], mode) as file:
+            for recipes in self.batches(last_id, options['batch_size']):
+                file.writelines(
+                    json.dumps(self.record(recipe), ensure_ascii=False)
+                    + '\n'
+                    for recipe in recipes
+                )
+                exported += len(recipes)
+                last_id = recipes[-1].id
+                # Прогресс в stderr: stdout может быть самим файлом выгрузки.
+                self.stderr.write(
+                    f'Выгружено {exported}, последний id {last_id}'
+                )
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка завершена: {exported} рецептов.'
+        ))
+
+    def batches(self, last_id, batch_size):
+        """Рецепты пачками по возрастанию id, без OFFSET."""
+        queryset = Recipe.objects.order_by('id').select_related(
+            'author'
+        ).prefetch_related(Prefetch(
+            'ingredients_in_recipe',
+            queryset=IngredientInRecipe.objects.select_related(
+                'ingredient'
+            ).order_by('id')
+        ))
+        while True:
+            recipes = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not recipes:
+                return
+            yield recipes
+            last_id = recipes[-1].id
+
+    def record(self, recipe):
+        author = recipe.author
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'image_renditions': recipe.image_renditions,
+            'author': {
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+            },
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients_in_recipe.all()
+            ],
+        }
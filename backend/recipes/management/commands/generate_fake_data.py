@@ -0,0 +1,288 @@
+import random
+import time
+from bisect import bisect_left
+from io import StringIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.cache import invalidate_recipes
+from recipes.counters import recalculate_counters
+from recipes.feed import fan_out_on_write
+from recipes.management.ndjson import batches
+from recipes.models import (Favorite, FeedItem, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart,
+                            ShoppingCartIngredient, Subscription, User)
+
+DISHES = (
+    'Суп', 'Салат', 'Пирог', 'Рагу', 'Запеканка', 'Каша', 'Омлет',
+    'Паста', 'Соус', 'Десерт', 'Смузи', 'Плов', 'Котлеты', 'Блины',
+)
+STEPS = (
+    'Нарежьте {}.', 'Обжарьте {} до золотистого цвета.',
+    'Добавьте {} и перемешайте.', 'Тушите {} под крышкой 10 минут.',
+    'Посыпьте {} перед подачей.',
+)
+
+
+class Zipf:
+    """Случайный выбор с вероятностью, убывающей как 1 / rank^exponent.
+
+    Так распределены популярность авторов, рецептов и продуктов:
+    немногие элементы получают основную долю связей.
+    """
+
+    def __init__(self, items, exponent, rnd):
+        self.items = items
+        self.rnd = rnd
+        self.cum_weights = list(accumulate(
+            1 / (rank ** exponent) for rank in range(1, len(items) + 1)
+        ))
+
+    def choice(self):
+        point = self.rnd.random() * self.cum_weights[-1]
+        return self.items[bisect_left(self.cum_weights, point)]
+
+    def sample(self, count, exclude=None):
+        """До count разных элементов, кроме exclude."""
+        count = min(count, len(self.items) - (exclude is not None))
+        chosen = set()
+        # Попытки ограничены: при сильном перекосе редкие элементы
+        # выпадают редко, и ровно count набирать необязательно.
+        for _ in range(count * 4):
+            if len(chosen) >= count:
+                break
+            item = self.choice()
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n'
+    ).replace('\r', '\\r')
+
+
+def copy_rows(model, fields, rows):
+    """Загружает строки в таблицу модели через COPY FROM STDIN.
+
+    Сигналы, auto_now и значения по умолчанию Django при этом не
+    работают: все обязательные поля передаются явно.
+    """
+    buffer = StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(value) for value in row) + '\n')
+    buffer.seek(0)
+    columns = ', '.join(model._meta.get_field(name).column for name in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({columns}) FROM STDIN', buffer
+        )
+
+
+def reserve_ids(model, count):
+    """Берёт count значений из последовательности первичного ключа.
+
+    С готовыми id строки можно загрузить через COPY и сразу ссылаться
+    на них из связанных таблиц, не перечитывая их из базы.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических пользователей, рецептов, избранного, '
+        'корзин и подписок для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок; число подписчиков у авторов '
+                 'распределено по степенному закону',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--prefix', default='fake')
+        parser.add_argument(
+            '--password', default='fake-password',
+            help='Пароль всех созданных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Генерация использует COPY PostgreSQL')
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        if not ingredient_ids:
+            raise CommandError(
+                'Каталог продуктов пуст, сначала выполните load_ingredients'
+            )
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                'укажите другой --prefix'
+            )
+
+        self.rnd = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        with transaction.atomic():
+            user_ids = self.create_users(options)
+            recipe_ids = self.create_recipes(
+                options, user_ids, ingredient_ids
+            )
+            self.create_relations(options, user_ids, recipe_ids)
+            self.create_subscriptions(options, user_ids)
+
+            # bulk_create и COPY не отправляют сигналы: счётчики, списки
+            # покупок и ленты собираются целиком.
+            recalculate_counters()
+            ShoppingCartIngredient.objects.rebuild()
+            if fan_out_on_write():
+                FeedItem.objects.rebuild()
+            self.progress('Счётчики, списки покупок и ленты собраны')
+        invalidate_recipes([])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - self.started:.0f} с.'
+        ))
+
+    def progress(self, message):
+        self.stdout.write(
+            f'[{time.monotonic() - self.started:7.1f} с] {message}'
+        )
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        # Хэш считается один раз: PBKDF2 на каждого пользователя
+        # занял бы больше времени, чем вся генерация.
+        password = make_password(options['password'])
+        now = timezone.now()
+        user_ids = []
+        for numbers in batches(range(options['users']), self.batch_size):
+            ids = reserve_ids(User, len(numbers))
+            copy_rows(
+                User,
+                ('id', 'email', 'username', 'first_name', 'last_name',
+                 'password', 'is_superuser', 'is_staff', 'is_active',
+                 'date_joined', 'updated_at', 'avatar_renditions',
+                 'recipes_count', 'followers_count', 'following_count'),
+                (
+                    (pk, f'{prefix}{i}@{prefix}.local', f'{prefix}_{i}',
+                     f'Имя {i}', f'Фамилия {i}', password, False, False,
+                     True, now, now, '{}', 0, 0, 0)
+                    for pk, i in zip(ids, numbers)
+                )
+            )
+            user_ids.extend(ids)
+        self.progress(f'Пользователей: {len(user_ids)}')
+        return user_ids
+
+    def create_recipes(self, options, user_ids, ingredient_ids):
+        authors = Zipf(user_ids, 0.6, self.rnd)
+        ingredients = Zipf(ingredient_ids, 0.8, self.rnd)
+        names = dict(Ingredient.objects.values_list('id', 'name'))
+        now = timezone.now()
+        recipe_ids = []
+        for numbers in batches(range(options['recipes']), self.batch_size):
+            ids = reserve_ids(Recipe, len(numbers))
+            mixes = [
+                ingredients.sample(options['ingredients_per_recipe'])
+                for _ in numbers
+            ]
+            # Поисковый вектор заполняет триггер и при COPY.
+            copy_rows(
+                Recipe,
+                ('id', 'name', 'text', 'cooking_time', 'image',
+                 'image_renditions', 'author', 'favorites_count',
+                 'ingredients_count', 'updated_at'),
+                (
+                    (pk, *self.recipe_text(i, [names[id_] for id_ in mix]),
+                     self.rnd.randint(1, 180), 'recipes/fake.jpg', '{}',
+                     authors.choice(), 0, len(mix), now)
+                    for pk, i, mix in zip(ids, numbers, mixes)
+                )
+            )
+            copy_rows(
+                IngredientInRecipe, ('recipe', 'ingredient', 'amount'),
+                (
+                    (pk, ingredient_id, self.rnd.randint(1, 500))
+                    for pk, mix in zip(ids, mixes)
+                    for ingredient_id in mix
+                )
+            )
+            recipe_ids.extend(ids)
+            self.progress(f'Рецептов: {len(recipe_ids)}')
+        return recipe_ids
+
+    def recipe_text(self, number, ingredient_names):
+        """Название и описание рецепта из его продуктов."""
+        main = ingredient_names[0] if ingredient_names else 'вода'
+        return (
+            f'{self.rnd.choice(DISHES)}: {main} №{number}',
+            ' '.join(
+                self.rnd.choice(STEPS).format(name)
+                for name in ingredient_names
+            ) or 'Синтетический рецепт.',
+        )
+
+    def create_relations(self, options, user_ids, recipe_ids):
+        recipes = Zipf(recipe_ids, 1.0, self.rnd)
+        for model, per_user in (
+            (Favorite, options['favorites_per_user']),
+            (ShoppingCart, options['cart_per_user']),
+        ):
+            total = 0
+            for users in batches(user_ids, self.batch_size):
+                rows = [
+                    (user_id, recipe_id)
+                    for user_id in users
+                    for recipe_id in recipes.sample(per_user)
+                ]
+                copy_rows(model, ('user', 'recipe'), rows)
+                total += len(rows)
+            self.progress(f'{model._meta.verbose_name_plural}: {total}')
+
+    def create_subscriptions(self, options, user_ids):
+        """Подписки со степенным распределением подписчиков.
+
+        Число подписок пользователя выбирается экспоненциально вокруг
+        среднего, авторы — по закону Ципфа, поэтому у немногих авторов
+        оказывается большая часть подписчиков.
+        """
+        authors = Zipf(user_ids, 0.8, self.rnd)
+        mean = options['follows_per_user']
+        total = 0
+        for users in batches(user_ids, self.batch_size):
+            rows = [
+                (user_id, author_id)
+                for user_id in users
+                for author_id in authors.sample(
+                    round(self.rnd.expovariate(1 / mean)) if mean else 0,
+                    exclude=user_id,
+                )
+            ]
+            copy_rows(Subscription, ('follower', 'author'), rows)
+            total += len(rows)
+        self.progress(f'Подписок: {total}')
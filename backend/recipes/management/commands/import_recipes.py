@@ -0,0 +1,198 @@
+import json
+import os
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import invalidate_recipes
+from recipes.counters import increment_counters
+from recipes.feed import fan_out_on_write
+from recipes.ingredient_index import ingredient_index
+from recipes.management.ndjson import batches, open_stream
+from recipes.models import (FeedItem, ImportProgress, Ingredient,
+                            IngredientInRecipe, Recipe, User)
+
+
+RECIPE_KEYS = (
+    'name', 'text', 'cooking_time', 'image', 'author', 'ingredients'
+)
+AUTHOR_KEYS = ('email', 'username', 'first_name', 'last_name')
+INGREDIENT_KEYS = ('name', 'measurement_unit', 'amount')
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт рецептов из NDJSON пачками; после сбоя продолжает '
+        'с первой незагруженной пачки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='Файл NDJSON (.gz — сжатый), - — stdin'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--state',
+            help='Ключ прогресса в базе, по умолчанию абсолютный путь '
+                 'входного файла; для stdin прогресс без него не хранится',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первой строки, не глядя на файл прогресса',
+        )
+
+    def handle(self, *args, **options):
+        state = options['state']
+        if state is None and options['input'] != '-':
+            state = os.path.abspath(options['input'])
+        done = 0
+        if state and not options['restart']:
+            done = ImportProgress.objects.filter(source=state).values_list(
+                'lines', flat=True
+            ).first() or 0
+        if done:
+            self.stdout.write(f'Продолжение со строки {done + 1}')
+
+        imported = 0
+        with open_stream(options['input']) as file:
+            lines = islice(enumerate(file, 1), done, None)
+            for batch in batches(lines, options['batch_size']):
+                records = [
+                    self.parse(number, line)
+                    for number, line in batch if line.strip()
+                ]
+                done = batch[-1][0]
+                # Прогресс фиксируется вместе с пачкой: после сбоя
+                # пачка не загрузится повторно и не потеряется.
+                with transaction.atomic():
+                    self.import_batch(records)
+                    if state:
+                        ImportProgress.objects.update_or_create(
+                            source=state, defaults={'lines': done}
+                        )
+                imported += len(records)
+                self.stdout.write(
+                    f'Импортировано {imported}, строк обработано {done}'
+                )
+
+        # Индекс продуктов и кэш ответов сбрасываются один раз в конце,
+        # счётчики и ленты обновляет import_batch.
+        ingredient_index.invalidate()
+        invalidate_recipes([])
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён: {imported} рецептов.'
+        ))
+
+    def parse(self, number, line):
+        try:
+            record = json.loads(line)
+            self.check_keys(record, RECIPE_KEYS)
+            self.check_keys(record['author'], AUTHOR_KEYS)
+            for item in record['ingredients']:
+                self.check_keys(item, INGREDIENT_KEYS)
+        except (ValueError, KeyError, TypeError) as error:
+            raise CommandError(
+                f'Строка {number}: некорректная запись ({error})'
+            )
+        return record
+
+    def check_keys(self, data, keys):
+        missing = [key for key in keys if key not in data]
+        if missing:
+            raise ValueError(f'нет полей {", ".join(missing)}')
+
+    def import_batch(self, records):
+        authors = self.resolve_authors(records)
+        ingredients = self.resolve_ingredients(records)
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                image_renditions=record.get('image_renditions') or {},
+                author_id=authors[record['author']['email']],
+                ingredients_count=len(record['ingredients']),
+            )
+            for record in records
+        )
+        items = IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredients[item['name']],
+                amount=item['amount'],
+            )
+            for recipe, record in zip(recipes, records)
+            for item in record['ingredients']
+        )
+        # bulk_create не отправляет сигналы: счётчики и ленты
+        # обновляются только для строк этой пачки.
+        increment_counters(User, 'recipes_count', Counter(
+            recipe.author_id for recipe in recipes
+        ))
+        increment_counters(Ingredient, 'recipes_count', Counter(
+            item.ingredient_id for item in items
+        ))
+        if fan_out_on_write():
+            FeedItem.objects.fan_out_recipes(
+                [recipe.id for recipe in recipes]
+            )
+
+    def resolve_authors(self, records):
+        """Возвращает {email: id}, недостающих авторов создаёт."""
+        authors = {record['author']['email']: record['author']
+                   for record in records}
+        ids = dict(User.objects.filter(email__in=authors).values_list(
+            'email', 'id'
+        ))
+        missing = [author for email, author in authors.items()
+                   if email not in ids]
+        if missing:
+            User.objects.bulk_create(
+                (
+                    User(
+                        email=author['email'],
+                        username=author['username'],
+                        first_name=author['first_name'],
+                        last_name=author['last_name'],
+                        password=make_password(None),
+                    )
+                    for author in missing
+                ),
+                ignore_conflicts=True
+            )
+            ids.update(User.objects.filter(
+                email__in=[author['email'] for author in missing]
+            ).values_list('email', 'id'))
+        unresolved = sorted(authors.keys() - ids.keys())
+        if unresolved:
+            raise CommandError(
+                f'Не удалось создать авторов {unresolved}: '
+                'имя пользователя уже занято'
+            )
+        return ids
+
+    def resolve_ingredients(self, records):
+        """Возвращает {название: id}, недостающие продукты создаёт."""
+        units = {
+            item['name']: item['measurement_unit']
+            for record in records for item in record['ingredients']
+        }
+        ids = dict(Ingredient.objects.filter(name__in=units).values_list(
+            'name', 'id'
+        ))
+        missing = units.keys() - ids.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=units[name])
+                    for name in missing
+                ),
+                ignore_conflicts=True
+            )
+            ids.update(Ingredient.objects.filter(name__in=missing)
+                       .values_list('name', 'id'))
+        return ids
@@ -1,26 +1,97 @@
-import json
-from django.core.management.base import BaseCommand
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.ingredient_index import ingredient_index
+from recipes.management.ndjson import batches, iter_json_array, open_stream
 from recipes.models import Ingredient
-from django.db.utils import IntegrityError
+
+FORMATS = ('json', 'csv')
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из ingredients.json'
+    help = (
+        'Загрузка и обновление каталога продуктов из JSON или CSV '
+        '(название, единица измерения)'
+    )
 
-    def handle(self, *args, **kwargs):
-        file_path = 'api/preload_data/ingredients.json'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='api/preload_data/ingredients.json',
+            help='Файл каталога (.gz — сжатый)',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию — по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Посчитать изменения и откатить их',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or self.detect_format(path)
+        counts = {
+            'inserted': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0
+        }
         try:
-            with open(file_path, encoding='utf-8') as file:
-                created_ingredients = Ingredient.objects.bulk_create(
-                    (Ingredient(**item) for item in json.load(file)),
-                    ignore_conflicts=True
+            with open_stream(path) as file, transaction.atomic():
+                items = (
+                    iter_json_array(file) if file_format == 'json'
+                    else self.read_csv(file)
                 )
+                for batch in batches(items, options['batch_size']):
+                    self.load_batch(batch, counts, options['verbosity'])
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            raise CommandError(f'Ошибка загрузки {path}: {error}')
+
+        if not options['dry_run'] and (counts['inserted']
+                                       or counts['updated']):
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            ('Пробный запуск, изменения отменены. ' if options['dry_run']
+             else '')
+            + f'Добавлено {counts["inserted"]}, '
+            f'обновлено {counts["updated"]}, '
+            f'без изменений {counts["unchanged"]}, '
+            f'повторов в пачке пропущено {counts["duplicates"]}.'
+        ))
+
+    def detect_format(self, path):
+        extension = os.path.splitext(path.removesuffix('.gz'))[1][1:]
+        if extension not in FORMATS:
+            raise CommandError(
+                f'Не удалось определить формат {path}, укажите --format'
+            )
+        return extension
 
-            self.stdout.write(self.style.SUCCESS(
-                f'Загружено {len(created_ingredients)} новых ингредиентов.'
-            ))
+    def read_csv(self, file):
+        for row in csv.reader(file):
+            if not row or row == ['name', 'measurement_unit']:
+                continue
+            name, measurement_unit = row
+            yield {'name': name, 'measurement_unit': measurement_unit}
 
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(
-                f'Непредвиденная ошибка: {file_path}: {e}'
-            ))
+    def load_batch(self, batch, counts, verbosity):
+        # Повтор названия в одной пачке ON CONFLICT обработать не может,
+        # побеждает последняя запись.
+        units = {
+            item['name'].strip(): item['measurement_unit'].strip()
+            for item in batch
+        }
+        changed = Ingredient.objects.upsert(units)
+        inserted = sum(1 for _, is_inserted in changed if is_inserted)
+        counts['inserted'] += inserted
+        counts['updated'] += len(changed) - inserted
+        counts['unchanged'] += len(units) - len(changed)
+        counts['duplicates'] += len(batch) - len(units)
+        if verbosity > 1:
+            for name, is_inserted in changed:
+                action = 'добавлен' if is_inserted else 'обновлён'
+                self.stdout.write(f'{action}: {name} ({units[name]})')
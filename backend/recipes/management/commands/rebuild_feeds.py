@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = 'Пересборка входящих лент подписок (стратегия write)'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            FeedItem.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {FeedItem.objects.count()}.'
+        ))
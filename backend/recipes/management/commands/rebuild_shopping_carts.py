@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.models import ShoppingCart, ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Проверка и пересборка сводных списков покупок с нуля'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            expected = {
+                (row['user_id'], row['ingredient_id']): row['amount']
+                # Без order_by() Meta.ordering попадает в GROUP BY.
+                for row in ShoppingCart.objects.order_by().values(
+                    'user_id',
+                    ingredient_id=F(
+                        'recipe__ingredients_in_recipe__ingredient_id'
+                    ),
+                ).annotate(
+                    amount=Sum('recipe__ingredients_in_recipe__amount')
+                ).iterator()
+            }
+            stored = {
+                (row['user_id'], row['ingredient_id']): row['amount']
+                for row in ShoppingCartIngredient.objects.values(
+                    'user_id', 'ingredient_id', 'amount'
+                ).iterator()
+            }
+            mismatched = {
+                key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            }
+            ShoppingCartIngredient.objects.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, расхождений: {len(mismatched)}.'
+        ))
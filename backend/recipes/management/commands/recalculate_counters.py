@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recalculate_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, рецептов и подписчиков'
+
+    def handle(self, *args, **kwargs):
+        recalculate_counters()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
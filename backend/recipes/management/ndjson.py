@@ -0,0 +1,65 @@
+"""Потоковое чтение и запись файлов для команд импорта и выгрузки.
+
+Путь - означает stdin/stdout, файлы с расширением .gz сжимаются gzip.
+"""
+import gzip
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+
+@contextmanager
+def open_stream(path, mode='r'):
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, f'{mode}t', encoding='utf-8') as file:
+        yield file
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """Элементы JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and not started:
+            if buffer[0] != '[':
+                raise ValueError('Ожидается JSON-массив')
+            buffer, started = buffer[1:], True
+            continue
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith(']'):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                # Число в конце буфера может продолжаться в следующем куске.
+                if end < len(buffer) or eof:
+                    yield item
+                    buffer = buffer[end:]
+                    continue
+        if eof:
+            raise ValueError('Неожиданный конец JSON-массива')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def batches(iterable, size):
+    """Делит поток на списки по size элементов, не читая его целиком."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,100 @@
+import random
+
+from recipes.counters import recalculate_counters
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, ShoppingCartIngredient,
+                            Subscription, User)
+
+
+SEED_PREFIX = 'bench'
+
+# Замеры идут без кэша: иначе часть запросов эндпоинта не выполнится,
+# а данные откатываемого набора попадут в общий кэш.
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+def seed_dataset(users, recipes, ingredients, ingredients_per_recipe,
+                 favorites, subscriptions, cart, seed):
+    """Создаёт синтетический набор данных и возвращает его пользователей.
+
+    Все объекты помечаются префиксом SEED_PREFIX, значения выбираются
+    генератором с фиксированным seed, поэтому прогоны воспроизводимы.
+    """
+    rnd = random.Random(seed)
+
+    User.objects.bulk_create(
+        User(
+            email=f'{SEED_PREFIX}{i}@{SEED_PREFIX}.local',
+            username=f'{SEED_PREFIX}_{i}',
+            first_name='Имя',
+            last_name=f'Фамилия {i}',
+        )
+        for i in range(users)
+    )
+    seeded_users = list(
+        User.objects.filter(username__startswith=f'{SEED_PREFIX}_')
+        .order_by('id')
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(
+            name=f'{SEED_PREFIX} ингредиент {i}',
+            measurement_unit=rnd.choice(('г', 'мл', 'шт.')),
+        )
+        for i in range(ingredients)
+    )
+    ingredient_ids = list(
+        Ingredient.objects.filter(name__startswith=f'{SEED_PREFIX} ')
+        .values_list('id', flat=True)
+    )
+
+    Recipe.objects.bulk_create(
+        Recipe(
+            name=f'{SEED_PREFIX} рецепт {i}',
+            text='Синтетический рецепт для измерений.',
+            image='recipes/bench.jpg',
+            author=rnd.choice(seeded_users),
+            cooking_time=rnd.randint(1, 180),
+        )
+        for i in range(recipes)
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(name__startswith=f'{SEED_PREFIX} ')
+        .values_list('id', flat=True)
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=rnd.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rnd.sample(
+            ingredient_ids, min(ingredients_per_recipe, len(ingredient_ids))
+        )
+    )
+
+    for model, per_user in ((Favorite, favorites), (ShoppingCart, cart)):
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe_id)
+            for user in seeded_users
+            for recipe_id in rnd.sample(
+                recipe_ids, min(per_user, len(recipe_ids))
+            )
+        )
+    Subscription.objects.bulk_create(
+        Subscription(follower=user, author=author)
+        for user in seeded_users
+        for author in rnd.sample(
+            seeded_users, min(subscriptions, len(seeded_users))
+        )
+        if author != user
+    )
+    # bulk_create не отправляет сигналы: счётчики и сводные списки
+    # покупок собираем целиком.
+    recalculate_counters()
+    ShoppingCartIngredient.objects.rebuild()
+    return seeded_users
@@ -1,10 +1,37 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models
+from django.db.models import (BooleanField, Case, Count, Exists, F,
+                              FloatField, IntegerField, Max, OuterRef, Sum,
+                              Value, When, Window)
+from django.db.models.functions import Cast, Ln, RowNumber
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.core.validators import MinValueValidator
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Защищает счётчики от перезаписи при сохранении объекта.
+
+    Счётчики меняются F-выражениями в обход объекта, поэтому save()
+    существующей записи сохраняет все поля, кроме counter_fields.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None):
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         verbose_name='Почта',
         max_length=254,
@@ -36,6 +63,32 @@ class User(AbstractUser):
         default=None,
         null=True,
     )
+    avatar_renditions = models.JSONField(
+        verbose_name='Копии аватарки',
+        default=dict,
+        editable=False,
+    )
+    recipes_count = models.IntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.IntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    following_count = models.IntegerField(
+        verbose_name='Количество подписок',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    counter_fields = ('recipes_count', 'followers_count', 'following_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -49,6 +102,83 @@ class User(AbstractUser):
         return self.username
 
 
+def in_placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def execute_returning_rows(sql, params):
+    """Выполняет запрос с RETURNING и возвращает все строки."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def execute_returning(sql, params):
+    """Выполняет запрос с RETURNING и возвращает первый столбец."""
+    return [row[0] for row in execute_returning_rows(sql, params)]
+
+
+class SubscriptionManager(models.Manager):
+    """Массовые подписки одним INSERT или DELETE.
+
+    Сигналы при этом не отправляются, поэтому счётчики и ленты
+    обновляются здесь же.
+    """
+
+    def add_authors(self, follower_id, author_ids):
+        """Подписывает на существующих авторов, кроме самого себя.
+
+        Существующие подписки пропускаются. Возвращает id авторов,
+        подписка на которых создана.
+        """
+        if not author_ids:
+            return []
+        created = execute_returning('''
+            INSERT INTO {subscription} (follower_id, author_id)
+            SELECT %s, id FROM {user} WHERE id IN ({ids}) AND id <> %s
+            ON CONFLICT (follower_id, author_id) DO NOTHING
+            RETURNING author_id
+        '''.format(
+            subscription=self.model._meta.db_table,
+            user=User._meta.db_table,
+            ids=in_placeholders(author_ids),
+        ), [follower_id, *author_ids, follower_id])
+        self._update_related(follower_id, created, 1)
+        return created
+
+    def remove_authors(self, follower_id, author_ids):
+        """Удаляет подписки и возвращает id авторов, от которых отписались."""
+        if not author_ids:
+            return []
+        deleted = execute_returning('''
+            DELETE FROM {subscription}
+            WHERE follower_id = %s AND author_id IN ({ids})
+            RETURNING author_id
+        '''.format(
+            subscription=self.model._meta.db_table,
+            ids=in_placeholders(author_ids),
+        ), [follower_id, *author_ids])
+        self._update_related(follower_id, deleted, -1)
+        return deleted
+
+    def _update_related(self, follower_id, author_ids, delta):
+        from .feed import fan_out_on_write
+
+        if not author_ids:
+            return
+        User.objects.filter(pk__in=author_ids).update(
+            followers_count=F('followers_count') + delta
+        )
+        User.objects.filter(pk=follower_id).update(
+            following_count=F('following_count') + delta * len(author_ids)
+        )
+        if fan_out_on_write():
+            if delta > 0:
+                FeedItem.objects.add_authors(follower_id, author_ids)
+            else:
+                FeedItem.objects.remove_authors(follower_id, author_ids)
+
+
 class Subscription(models.Model):
     follower = models.ForeignKey(
         User,
@@ -60,13 +190,23 @@ class Subscription(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='authors',
-        verbose_name="Автор"
+        verbose_name="Автор",
+        db_index=False
     )
 
+    objects = SubscriptionManager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('follower',)
+        indexes = [
+            # Подписчики автора; заменяет одиночный индекс по author.
+            models.Index(
+                fields=['author', 'follower'],
+                name='subscription_author_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['follower', 'author'],
@@ -74,7 +214,32 @@ class Subscription(models.Model):
             )
         ]
 
-class Ingredient(models.Model):
+
+class IngredientManager(models.Manager):
+    def upsert(self, units):
+        """Добавляет продукты и обновляет единицы измерения по названию.
+
+        units — {название: единица измерения}. Возвращает пары
+        (название, добавлен ли продукт) только для добавленных и
+        изменённых строк; строки без изменений не перезаписываются.
+        """
+        if not units:
+            return []
+        return execute_returning_rows('''
+            INSERT INTO {ingredient} (name, measurement_unit, recipes_count)
+            VALUES {values}
+            ON CONFLICT (name) DO UPDATE
+            SET measurement_unit = EXCLUDED.measurement_unit
+            WHERE {ingredient}.measurement_unit
+                IS DISTINCT FROM EXCLUDED.measurement_unit
+            RETURNING name, xmax = 0
+        '''.format(
+            ingredient=self.model._meta.db_table,
+            values=', '.join(['(%s, %s, 0)'] * len(units)),
+        ), [value for unit in units.items() for value in unit])
+
+
+class Ingredient(CounterFieldsMixin, models.Model):
     name = models.CharField(
         max_length=128,
         unique=True,
@@ -84,6 +249,15 @@ class Ingredient(models.Model):
         max_length=64,
         verbose_name="Единица измерения"
     )
+    recipes_count = models.IntegerField(
+        verbose_name="Количество рецептов",
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('recipes_count',)
+
+    objects = IngredientManager()
 
     def __str__(self):
         return self.name
@@ -92,6 +266,14 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
+        indexes = [
+            # Поиск по началу названия (name__startswith).
+            models.Index(
+                fields=['name'],
+                name='ingredient_name_pattern_idx',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["name", "measurement_unit"],
@@ -100,7 +282,53 @@ class Ingredient(models.Model):
         ]
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                follower=user, author=OuterRef('author')
+            )),
+        )
+
+    def limited_per_author(self, limit):
+        """Первые limit рецептов каждого автора одним запросом.
+
+        Рецепты нумеруются оконной функцией внутри автора в порядке
+        (name, id), отбор по номеру делается во внешнем запросе.
+        """
+        sql, params = self.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F('name').asc(), F('id').asc()],
+        )).order_by().query.sql_with_params()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) AS ranked '
+            'WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit)
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    def get_queryset(self):
+        # Вектор нужен только для поиска в WHERE/ORDER BY,
+        # тянуть его в каждый объект рецепта незачем.
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField(
         max_length=256,
         verbose_name="Название"
@@ -112,6 +340,11 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name="Фото"
     )
+    image_renditions = models.JSONField(
+        verbose_name="Копии фото",
+        default=dict,
+        editable=False,
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='IngredientInRecipe',
@@ -120,12 +353,37 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name="Автор"
+        verbose_name="Автор",
+        db_index=False
     )
     cooking_time = models.IntegerField(
         validators=[MinValueValidator(1)],
         verbose_name="Время приготовления"
     )
+    favorites_count = models.IntegerField(
+        verbose_name="Количество добавлений в избранное",
+        default=0,
+        editable=False,
+    )
+    ingredients_count = models.IntegerField(
+        verbose_name="Количество продуктов",
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
+
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор",
+        null=True,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count', 'ingredients_count')
+
+    objects = RecipeManager()
 
     def __str__(self):
         return self.name
@@ -135,6 +393,77 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = [
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+            models.Index(fields=['name', 'id'], name='recipe_name_idx'),
+            models.Index(
+                fields=['author', 'name'],
+                name='recipe_author_name_idx'
+            ),
+            # Лента подписок: новые рецепты авторов.
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+        ]
+
+
+class IngredientInRecipeManager(models.Manager):
+    def remove_items(self, recipe_id, item_ids):
+        """Удаляет строки продуктов рецепта одним DELETE без сигналов.
+
+        Счётчики продуктов и рецепта обновляются здесь, списки покупок
+        переносит вызывающий код. Возвращает id продуктов удалённых строк.
+        """
+        if not item_ids:
+            return []
+        deleted = execute_returning('''
+            DELETE FROM {item}
+            WHERE recipe_id = %s AND id IN ({ids})
+            RETURNING ingredient_id
+        '''.format(
+            item=self.model._meta.db_table,
+            ids=in_placeholders(item_ids),
+        ), [recipe_id, *item_ids])
+        if deleted:
+            Ingredient.objects.filter(pk__in=deleted).update(
+                recipes_count=F('recipes_count') - 1
+            )
+            Recipe.objects.filter(pk=recipe_id).update(
+                ingredients_count=F('ingredients_count') - len(deleted)
+            )
+        return deleted
+
+    def match_recipes(self, ingredient_ids):
+        """Рейтинг рецептов по набору продуктов.
+
+        Строки выбираются по индексу (ingredient, recipe) и группируются
+        по рецепту: matched — сколько продуктов из набора есть в рецепте,
+        missing — сколько продуктов рецепта в наборе нет, score — сумма
+        весов совпавших продуктов (редкий продукт весит больше).
+        Сначала идут рецепты, для которых хватает всех продуктов.
+        Общее число продуктов берётся из Recipe.ingredients_count, вес
+        считается в double precision: логарифм numeric заметно медленнее.
+        """
+        return self.filter(ingredient__in=ingredient_ids).order_by().values(
+            'recipe'
+        ).annotate(
+            matched=Count('pk'),
+            score=Sum(1.0 / Ln(
+                Cast('ingredient__recipes_count', FloatField()) + 2.0,
+                output_field=FloatField()
+            )),
+            missing=Max('recipe__ingredients_count') - Count('pk'),
+        ).annotate(
+            is_complete=Case(
+                When(missing=0, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by('-is_complete', '-score', 'missing', '-recipe_id')
 
 
 class IngredientInRecipe(models.Model):
@@ -146,15 +475,97 @@ class IngredientInRecipe(models.Model):
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
-        verbose_name="Продукты рецепта"
+        verbose_name="Продукты рецепта",
+        db_index=False
     )
     amount = models.PositiveIntegerField(
         verbose_name="Количество",
         validators=[MinValueValidator(1)]
     )
 
+    objects = IngredientInRecipeManager()
+
     class Meta:
         default_related_name = 'ingredients_in_recipe'
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='ingredient_recipe_idx'
+            ),
+        ]
+
+
+class UserRecipeRelationManager(models.Manager):
+    """Массовое добавление и удаление рецептов одним INSERT или DELETE.
+
+    Сигналы при этом не отправляются: зависимые данные обновляют
+    recipes_added и recipes_removed наследников.
+    """
+
+    def add_recipes(self, user_id, recipe_ids):
+        """Добавляет существующие рецепты, уже добавленные пропускает.
+
+        Возвращает id рецептов, которые действительно добавлены.
+        """
+        if not recipe_ids:
+            return []
+        created = execute_returning('''
+            INSERT INTO {relation} (user_id, recipe_id)
+            SELECT %s, id FROM {recipe} WHERE id IN ({ids})
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+            RETURNING recipe_id
+        '''.format(
+            relation=self.model._meta.db_table,
+            recipe=Recipe._meta.db_table,
+            ids=in_placeholders(recipe_ids),
+        ), [user_id, *recipe_ids])
+        if created:
+            self.recipes_added(user_id, created)
+        return created
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """Удаляет рецепты и возвращает id действительно удалённых."""
+        if not recipe_ids:
+            return []
+        deleted = execute_returning('''
+            DELETE FROM {relation}
+            WHERE user_id = %s AND recipe_id IN ({ids})
+            RETURNING recipe_id
+        '''.format(
+            relation=self.model._meta.db_table,
+            ids=in_placeholders(recipe_ids),
+        ), [user_id, *recipe_ids])
+        if deleted:
+            self.recipes_removed(user_id, deleted)
+        return deleted
+
+    def recipes_added(self, user_id, recipe_ids):
+        pass
+
+    def recipes_removed(self, user_id, recipe_ids):
+        pass
+
+
+class FavoriteManager(UserRecipeRelationManager):
+    def recipes_added(self, user_id, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            favorites_count=F('favorites_count') + 1
+        )
+
+    def recipes_removed(self, user_id, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            favorites_count=F('favorites_count') - 1
+        )
+
+
+class ShoppingCartManager(UserRecipeRelationManager):
+    def recipes_added(self, user_id, recipe_ids):
+        ShoppingCartIngredient.objects.add_user_recipes(user_id, recipe_ids)
+
+    def recipes_removed(self, user_id, recipe_ids):
+        ShoppingCartIngredient.objects.remove_user_recipes(
+            user_id, recipe_ids
+        )
 
 
 class UserRecipeRelation(models.Model):
@@ -184,6 +595,7 @@ class UserRecipeRelation(models.Model):
 
 
 class Favorite(UserRecipeRelation):
+    objects = FavoriteManager()
 
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Избранное'
@@ -191,7 +603,226 @@ class Favorite(UserRecipeRelation):
 
 
 class ShoppingCart(UserRecipeRelation):
+    objects = ShoppingCartManager()
 
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class ShoppingCartIngredientManager(models.Manager):
+    def _tables(self):
+        return {
+            'aggregate': self.model._meta.db_table,
+            'cart': ShoppingCart._meta.db_table,
+            'item': IngredientInRecipe._meta.db_table,
+        }
+
+    def apply_recipe_changes(self, recipe_id, deltas):
+        """Переносит изменение продуктов рецепта в списки покупок.
+
+        deltas — {id продукта: изменение количества}. Меняются только
+        эти продукты в списках тех, у кого рецепт лежит в корзине.
+        """
+        if not deltas:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO {aggregate} (user_id, ingredient_id, amount)
+                SELECT cart.user_id, delta.ingredient_id, delta.amount
+                FROM {cart} cart
+                CROSS JOIN (VALUES {values}) AS delta (ingredient_id, amount)
+                WHERE cart.recipe_id = %s
+                ON CONFLICT (user_id, ingredient_id)
+                DO UPDATE SET amount = {aggregate}.amount + EXCLUDED.amount
+            '''.format(
+                values=', '.join(['(%s, %s)'] * len(deltas)),
+                **self._tables()
+            ), [value for delta in deltas.items() for value in delta]
+                + [recipe_id])
+        self.filter(amount__lte=0, ingredient_id__in=[
+            ingredient_id for ingredient_id, delta in deltas.items()
+            if delta < 0
+        ]).delete()
+
+    def _apply_user_recipes(self, user_id, recipe_ids, sign):
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO {aggregate} (user_id, ingredient_id, amount)
+                SELECT %s, item.ingredient_id, %s * SUM(item.amount)
+                FROM {item} item
+                WHERE item.recipe_id IN ({ids})
+                GROUP BY item.ingredient_id
+                ON CONFLICT (user_id, ingredient_id)
+                DO UPDATE SET amount = {aggregate}.amount + EXCLUDED.amount
+            '''.format(ids=in_placeholders(recipe_ids), **self._tables()),
+                [user_id, sign, *recipe_ids])
+        if sign < 0:
+            self.filter(user_id=user_id, amount__lte=0).delete()
+
+    def add_user_recipes(self, user_id, recipe_ids):
+        """Добавляет продукты рецептов в список покупок пользователя.
+
+        Строки ShoppingCart не читаются: вызывающий код сам знает,
+        какие рецепты попали в корзину.
+        """
+        self._apply_user_recipes(user_id, recipe_ids, 1)
+
+    def remove_user_recipes(self, user_id, recipe_ids):
+        """Вычитает продукты рецептов из списка покупок пользователя."""
+        self._apply_user_recipes(user_id, recipe_ids, -1)
+
+    def rebuild(self):
+        self.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO {aggregate} (user_id, ingredient_id, amount)
+                SELECT cart.user_id, item.ingredient_id, SUM(item.amount)
+                FROM {cart} cart
+                JOIN {item} item ON item.recipe_id = cart.recipe_id
+                GROUP BY cart.user_id, item.ingredient_id
+            '''.format(**self._tables()))
+
+
+class ShoppingCartIngredient(models.Model):
+    """Сумма продуктов по всем рецептам из корзины пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Продукт",
+    )
+    amount = models.IntegerField(
+        verbose_name="Количество"
+    )
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        verbose_name = 'Продукт списка покупок'
+        verbose_name_plural = 'Продукты списков покупок'
+        default_related_name = 'shopping_cart_ingredients'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_cart_ingredient"
+            )
+        ]
+
+
+class FeedItemManager(models.Manager):
+    def _execute(self, sql, params, **placeholders):
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(
+                feed=self.model._meta.db_table,
+                subscription=Subscription._meta.db_table,
+                recipe=Recipe._meta.db_table,
+                **placeholders
+            ), params)
+
+    def fan_out(self, recipe_id, author_id):
+        """Кладёт новый рецепт во входящие ленты подписчиков автора."""
+        self._execute('''
+            INSERT INTO {feed} (user_id, recipe_id)
+            SELECT follower_id, %s FROM {subscription}
+            WHERE author_id = %s
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+        ''', [recipe_id, author_id])
+
+    def fan_out_recipes(self, recipe_ids):
+        """Кладёт рецепты во входящие ленты подписчиков их авторов."""
+        if not recipe_ids:
+            return
+        self._execute('''
+            INSERT INTO {feed} (user_id, recipe_id)
+            SELECT subscription.follower_id, recipe.id
+            FROM {recipe} recipe
+            JOIN {subscription} subscription
+                ON subscription.author_id = recipe.author_id
+            WHERE recipe.id IN ({ids})
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+        ''', recipe_ids, ids=in_placeholders(recipe_ids))
+
+    def add_authors(self, user_id, author_ids):
+        """Добавляет в ленту подписчика рецепты новых авторов."""
+        self._execute('''
+            INSERT INTO {feed} (user_id, recipe_id)
+            SELECT %s, id FROM {recipe}
+            WHERE author_id IN ({ids})
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+        ''', [user_id, *author_ids], ids=in_placeholders(author_ids))
+
+    def remove_authors(self, user_id, author_ids):
+        self.filter(
+            user_id=user_id, recipe__author_id__in=author_ids
+        ).delete()
+
+    def rebuild(self):
+        self.all().delete()
+        self._execute('''
+            INSERT INTO {feed} (user_id, recipe_id)
+            SELECT subscription.follower_id, recipe.id
+            FROM {subscription} subscription
+            JOIN {recipe} recipe ON recipe.author_id = subscription.author_id
+        ''', [])
+
+
+class FeedItem(models.Model):
+    """Рецепт во входящей ленте подписчика (стратегия fan-out-on-write)."""
+    # Поиск по user покрывает уникальный индекс (user, recipe).
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Подписчик",
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+
+    objects = FeedItemManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        default_related_name = 'feed_items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_feed_item"
+            )
+        ]
+
+
+class ImportProgress(models.Model):
+    """Число загруженных строк файла импорта.
+
+    Обновляется в одной транзакции с пачкой рецептов, поэтому после
+    сбоя не расходится с тем, что действительно попало в базу.
+    """
+    source = models.CharField(
+        verbose_name="Источник",
+        max_length=255,
+        unique=True,
+    )
+    lines = models.PositiveIntegerField(
+        verbose_name="Загружено строк",
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+
+    def __str__(self):
+        return f"{self.source}: {self.lines}"
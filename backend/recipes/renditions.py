@@ -0,0 +1,143 @@
+"""Уменьшенные копии фотографий рецептов и аватарок.
+
+Оригинал сохраняется в запросе, а копии (thumbnail, card, full)
+строятся в фоновом пуле потоков после коммита транзакции и
+записываются в поле <имя поля>_renditions модели.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+SOURCE = 'source'
+
+_executor = None
+
+
+def renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def rendition_format():
+    image_format = settings.IMAGE_RENDITION_FORMAT.upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='renditions',
+        )
+    return _executor
+
+
+def render(image, size, image_format):
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    has_alpha = 'A' in copy.getbands() or 'transparency' in copy.info
+    mode = 'RGBA' if has_alpha and image_format != 'JPEG' else 'RGB'
+    if copy.mode != mode:
+        copy = copy.convert(mode)
+    content = BytesIO()
+    copy.save(content, image_format, quality=settings.IMAGE_RENDITION_QUALITY)
+    return content.getvalue()
+
+
+def build_renditions(storage, name):
+    """Строит копии изображения и возвращает {размер: путь}.
+
+    Под ключом source хранится путь оригинала, по которому построены копии.
+    """
+    image_format = rendition_format()
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    directory, file_name = os.path.split(name)
+    stem = os.path.splitext(file_name)[0]
+    with storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    renditions = {SOURCE: name}
+    for rendition, size in settings.IMAGE_RENDITIONS.items():
+        renditions[rendition] = storage.save(
+            os.path.join(directory, 'renditions',
+                         f'{stem}_{rendition}.{extension}'),
+            ContentFile(render(image, size, image_format)),
+        )
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for rendition, name in (renditions or {}).items():
+        if rendition != SOURCE:
+            storage.delete(name)
+
+
+def process(model, pk, field_name, name):
+    """Строит копии и сохраняет их, если изображение не сменилось."""
+    try:
+        storage = model._meta.get_field(field_name).storage
+        renditions = build_renditions(storage, name)
+        attribute = renditions_field(field_name)
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(
+                pk=pk, **{field_name: name}
+            ).first()
+            if instance is None:
+                delete_renditions(storage, renditions)
+                return
+            delete_renditions(storage, getattr(instance, attribute))
+            setattr(instance, attribute, renditions)
+            instance.save(update_fields=[attribute, 'updated_at'])
+    except Exception:
+        logger.exception(
+            'Не удалось построить копии %s для %s #%s', name,
+            model.__name__, pk
+        )
+
+
+def process_in_worker(*args):
+    try:
+        process(*args)
+    finally:
+        connections.close_all()
+
+
+def sync(instance, field_name):
+    """Ставит построение копий в очередь, если изображение сменилось.
+
+    Копии строятся после коммита транзакции, при
+    IMAGE_PROCESSING_WORKERS = 0 — сразу в текущем потоке.
+    """
+    image = getattr(instance, field_name)
+    attribute = renditions_field(field_name)
+    renditions = getattr(instance, attribute) or {}
+    model, pk, name = type(instance), instance.pk, image.name
+    if renditions.get(SOURCE) == name or not (name or renditions):
+        return
+    if not name:
+        model.objects.filter(pk=pk).update(**{attribute: {}})
+        setattr(instance, attribute, {})
+        transaction.on_commit(
+            lambda: delete_renditions(image.storage, renditions)
+        )
+        return
+
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(
+                process_in_worker, model, pk, field_name, name
+            )
+        else:
+            process(model, pk, field_name, name)
+
+    transaction.on_commit(submit)
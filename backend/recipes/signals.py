@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import renditions
+from .feed import fan_out_on_write
+from .ingredient_index import ingredient_index
+from .models import (FeedItem, Favorite, Ingredient, IngredientInRecipe,
+                     Recipe, ShoppingCart, ShoppingCartIngredient,
+                     Subscription, User)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    # После фиксации: иначе индекс и кэш ответов о рецептах успеют
+    # заполниться старыми данными под новой версией каталога.
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def sync_recipe_image_renditions(sender, instance, **kwargs):
+    renditions.sync(instance, 'image')
+
+
+@receiver(post_save, sender=User)
+def sync_avatar_renditions(sender, instance, **kwargs):
+    renditions.sync(instance, 'avatar')
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image_renditions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: renditions.delete_renditions(
+        instance.image.storage, instance.image_renditions
+    ))
+
+
+SAVED_FIELDS = {
+    ShoppingCart: ('user_id', 'recipe_id'),
+    IngredientInRecipe: ('recipe_id', 'ingredient_id', 'amount'),
+    Favorite: ('recipe_id',),
+    Subscription: ('author_id', 'follower_id'),
+    Recipe: ('author_id',),
+}
+
+
+def row_values(instance):
+    fields = SAVED_FIELDS[type(instance)]
+    return {field: getattr(instance, field) for field in fields}
+
+
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=IngredientInRecipe)
+@receiver(pre_save, sender=Favorite)
+@receiver(pre_save, sender=Subscription)
+@receiver(pre_save, sender=Recipe)
+def remember_saved_row(sender, instance, **kwargs):
+    """Запоминает строку в базе до изменения для receivers post_save.
+
+    Для новой строки сохраняется None.
+    """
+    instance._saved_row = None
+    if instance.pk is not None:
+        instance._saved_row = sender.objects.filter(pk=instance.pk).values(
+            *SAVED_FIELDS[sender]
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def update_shopping_list(sender, instance, signal, **kwargs):
+    manager = ShoppingCartIngredient.objects
+    if signal is post_delete:
+        manager.remove_user_recipes(instance.user_id, [instance.recipe_id])
+        return
+    old = instance._saved_row
+    if old == row_values(instance):
+        return
+    if old:
+        manager.remove_user_recipes(old['user_id'], [old['recipe_id']])
+    manager.add_user_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def update_ingredient_in_shopping_lists(sender, instance, signal, **kwargs):
+    # Строки корзин и продуктов рецепта удаляются каскадом в любом
+    # порядке: изменение применяется к корзинам, которые ещё есть.
+    manager = ShoppingCartIngredient.objects
+    if signal is post_delete:
+        manager.apply_recipe_changes(
+            instance.recipe_id, {instance.ingredient_id: -instance.amount}
+        )
+        return
+    old = instance._saved_row
+    amount = instance.amount
+    if old and (old['recipe_id'], old['ingredient_id']) == (
+        instance.recipe_id, instance.ingredient_id
+    ):
+        amount -= old['amount']
+    elif old:
+        manager.apply_recipe_changes(
+            old['recipe_id'], {old['ingredient_id']: -old['amount']}
+        )
+    if amount:
+        manager.apply_recipe_changes(
+            instance.recipe_id, {instance.ingredient_id: amount}
+        )
+
+
+# Поле-ссылка sender: (модель, на которую оно ссылается, её счётчик).
+COUNTERS = {
+    Favorite: {'recipe_id': (Recipe, 'favorites_count')},
+    Subscription: {
+        'author_id': (User, 'followers_count'),
+        'follower_id': (User, 'following_count'),
+    },
+    Recipe: {'author_id': (User, 'recipes_count')},
+    IngredientInRecipe: {
+        'ingredient_id': (Ingredient, 'recipes_count'),
+        'recipe_id': (Recipe, 'ingredients_count'),
+    },
+}
+
+
+def counter_changes(instance, field, signal, created):
+    """{id: изменение счётчика} для объектов, на которые ссылается field."""
+    current = getattr(instance, field)
+    if signal is post_delete:
+        return {current: -1}
+    if created:
+        return {current: 1}
+    old = instance._saved_row and instance._saved_row[field]
+    if old is None or old == current:
+        return {}
+    # Ссылку перенесли на другой объект: счётчик переезжает вместе с ней.
+    return {old: -1, current: 1}
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=Subscription)
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def update_counters(sender, instance, signal, created=False, **kwargs):
+    for field, (model, counter) in COUNTERS[sender].items():
+        changes = counter_changes(instance, field, signal, created)
+        for pk, delta in changes.items():
+            model.objects.filter(pk=pk).update(
+                **{counter: F(counter) + delta}
+            )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created=False, **kwargs):
+    if created and fan_out_on_write():
+        FeedItem.objects.fan_out(instance.id, instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def update_feed(sender, instance, signal, created=False, **kwargs):
+    if not fan_out_on_write():
+        return
+    if signal is post_delete:
+        FeedItem.objects.remove_authors(
+            instance.follower_id, [instance.author_id]
+        )
+    elif created:
+        FeedItem.objects.add_authors(
+            instance.follower_id, [instance.author_id]
+        )
@@ -0,0 +1,210 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.counters import recalculate_counters
+from recipes.ingredient_index import (CATALOGUE_KEY, IngredientIndex,
+                                      ingredient_index)
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingCartIngredient,
+                            Subscription, User)
+from recipes.renditions import SOURCE
+
+
+class IngredientIndexTests(TestCase):
+
+    def setUp(self):
+        ingredient_index.invalidate()
+
+    def test_names_differing_only_in_case_and_yo(self):
+        names = ['Ёжевика тест', 'ежевика тест', 'Ежевика тест', 'ежевика']
+        for name in names:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        ingredient_index.invalidate()
+
+        found = [item['name'] for item in ingredient_index.search('ёжевика')]
+
+        self.assertEqual(found[0], 'ежевика')
+        self.assertCountEqual(found, names)
+
+    def test_api_search_with_duplicate_keys(self):
+        Ingredient.objects.create(name='Соль тест', measurement_unit='г')
+        Ingredient.objects.create(name='соль тест', measurement_unit='г')
+        ingredient_index.invalidate()
+
+        response = self.client.get('/api/ingredients/?name=СОЛЬ')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_version_does_not_repeat_after_eviction(self):
+        # Индекс другого процесса, который не видел invalidate().
+        worker = IngredientIndex()
+        cache.delete(CATALOGUE_KEY)
+        Ingredient.objects.create(name='перец тест', measurement_unit='г')
+        self.assertEqual(len(worker.search('перец')), 1)
+
+        Ingredient.objects.create(name='перец красный', measurement_unit='г')
+        ingredient_index.invalidate()
+        cache.delete(CATALOGUE_KEY)
+
+        self.assertEqual(len(worker.search('перец')), 2)
+
+
+class SignalTestCase(TestCase):
+    """Два пользователя, три продукта и два рецепта первого из них."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'user{number}@test.local', username=f'user{number}',
+                first_name='Имя', last_name='Фамилия', password='pw-123456',
+            )
+            for number in range(2)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(name=f'Продукт {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        self.recipes = [self.create_recipe(number) for number in range(2)]
+
+    def create_recipe(self, number):
+        image = 'recipes/test.jpg'
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {number}', text='Описание', image=image,
+            image_renditions={SOURCE: image}, author=self.users[0],
+            cooking_time=10,
+        )
+        for ingredient in self.ingredients[number:number + 2]:
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10
+            )
+        return recipe
+
+
+class ShoppingListSignalTests(SignalTestCase):
+    """Записи через ORM и админку меняют сводный список покупок."""
+
+    def shopping_list(self):
+        return sorted(ShoppingCartIngredient.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ))
+
+    def assertMatchesRebuild(self):
+        current = self.shopping_list()
+        ShoppingCartIngredient.objects.rebuild()
+        self.assertEqual(current, self.shopping_list())
+
+    def test_cart_rows(self):
+        for user in self.users:
+            for recipe in self.recipes:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+        self.assertEqual(len(self.shopping_list()), 6)
+        self.assertMatchesRebuild()
+
+        ShoppingCart.objects.get(user=self.users[0],
+                                 recipe=self.recipes[0]).delete()
+        self.assertMatchesRebuild()
+
+    def test_cart_row_changes(self):
+        cart = ShoppingCart.objects.create(user=self.users[0],
+                                           recipe=self.recipes[0])
+        cart.recipe = self.recipes[1]
+        cart.save()
+        self.assertMatchesRebuild()
+
+        cart.user = self.users[1]
+        cart.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            {user_id for user_id, _, _ in self.shopping_list()},
+            {self.users[1].id}
+        )
+
+        cart.save()
+        self.assertMatchesRebuild()
+
+    def test_recipe_ingredients(self):
+        for user in self.users:
+            ShoppingCart.objects.create(user=user, recipe=self.recipes[0])
+        item = self.recipes[0].ingredients_in_recipe.first()
+        item.amount = 25
+        item.save()
+        self.assertMatchesRebuild()
+
+        item.ingredient = self.ingredients[2]
+        item.save()
+        self.assertMatchesRebuild()
+
+        IngredientInRecipe.objects.create(
+            recipe=self.recipes[0], ingredient=self.ingredients[0], amount=3
+        )
+        self.assertMatchesRebuild()
+
+        item.delete()
+        self.assertMatchesRebuild()
+
+    def test_cascade_deletes(self):
+        for user in self.users:
+            for recipe in self.recipes:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+        self.recipes[0].delete()
+        self.assertMatchesRebuild()
+
+        self.users[1].delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(len(self.shopping_list()), 2)
+
+
+class CounterSignalTests(SignalTestCase):
+    """Перенос ссылки на другой объект переносит и счётчик."""
+
+    def counters(self):
+        return (
+            list(Recipe.objects.order_by('pk').values_list(
+                'favorites_count', 'ingredients_count'
+            )),
+            list(Ingredient.objects.order_by('pk').values_list(
+                'recipes_count', flat=True
+            )),
+            list(User.objects.order_by('pk').values_list(
+                'recipes_count', 'followers_count', 'following_count'
+            )),
+        )
+
+    def assertMatchesRecalculation(self):
+        current = self.counters()
+        recalculate_counters()
+        self.assertEqual(current, self.counters())
+
+    def test_favorite_recipe(self):
+        favorite = Favorite.objects.create(user=self.users[1],
+                                           recipe=self.recipes[0])
+        favorite.recipe = self.recipes[1]
+        favorite.save()
+        self.assertMatchesRecalculation()
+
+    def test_subscription(self):
+        subscription = Subscription.objects.create(follower=self.users[1],
+                                                   author=self.users[0])
+        subscription.follower, subscription.author = self.users
+        subscription.save()
+        self.assertMatchesRecalculation()
+
+    def test_ingredient_in_recipe(self):
+        item = self.recipes[0].ingredients_in_recipe.first()
+        item.ingredient = self.ingredients[2]
+        item.recipe = self.recipes[1]
+        item.save()
+        self.assertMatchesRecalculation()
+
+        item.amount = 20
+        item.save()
+        self.assertMatchesRecalculation()
+
+    def test_recipe_author(self):
+        recipe = self.recipes[0]
+        recipe.author = self.users[1]
+        recipe.save()
+        self.assertMatchesRecalculation()